@@ -1,9 +1,116 @@
 import os
-import yaml
 import re
-from typing import Dict, Any, List, Optional
+import json
+import threading
+import yaml
+from collections import ChainMap
+from typing import Dict, Any, List, Optional, Mapping, Tuple
 from dataclasses import dataclass
-from .model_resolver import resolve_model
+from .model_resolver import build_alias_table
+
+# 优先使用 libyaml 加速的 C 解析器，未编译 libyaml 时回退到纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 发现占位符中引用的变量名（宽松匹配，仅用于构建缓存键，多匹配只会让缓存键更保守）
+_ENV_DISCOVER_RE = re.compile(r'\$\{([^}:]+)')
+
+# 解析结果缓存的最大条目数（按 env 取值组合计）
+_MEMO_MAX_ENTRIES = 128
+
+# 已解析 YAML 的进程级缓存: {config_path: (mtime_ns, size, config, referenced_env_vars)}
+# 文件未变化时重复 load_config 直接复用，解析结果视为只读
+_YAML_CACHE: Dict[str, Tuple[int, int, Any, Tuple[str, ...]]] = {}
+
+# 跨进程的 JSON 缓存文件后缀 (agents.yaml -> agents.yaml.cache.json)
+# 首行记录源文件的 mtime_ns 与 size，不一致即视为失效
+_SIDECAR_SUFFIX = ".cache.json"
+_SIDECAR_HEADER = "# src-mtime: "
+
+
+def _read_json_sidecar(config_path: str, stamp: str) -> Optional[Tuple[Any, Tuple[str, ...]]]:
+    """读取与源文件时间戳匹配的 JSON 缓存，返回 (config, referenced_env_vars)；不可用时返回 None。"""
+    try:
+        with open(config_path + _SIDECAR_SUFFIX, 'r', encoding='utf-8') as f:
+            if f.readline().rstrip("\n") != _SIDECAR_HEADER + stamp:
+                return None
+            data = json.load(f)
+        return data["config"], tuple(data["env_vars"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_json_sidecar(config_path: str, stamp: str, config: Any, referenced: Tuple[str, ...]) -> None:
+    """原子写入 JSON 缓存 (tmp + os.replace)；写入失败不影响配置加载。"""
+    try:
+        body = json.dumps({"config": config, "env_vars": list(referenced)}, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return
+    # YAML 中的日期、非字符串键等无法无损往返 JSON，此时不写缓存
+    if json.loads(body)["config"] != config:
+        return
+
+    sidecar_path = config_path + _SIDECAR_SUFFIX
+    tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_SIDECAR_HEADER + stamp + "\n")
+            f.write(body)
+        os.replace(tmp_path, sidecar_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _expand_env(s: str, env: Mapping[str, str]) -> str:
+    """
+    单遍扫描替换 ${VAR} / ${VAR:default} 占位符。
+
+    语义与原正则实现一致：变量名非空且不含 '}' ':'，默认值非空且不含 '}'；不合法的占位符原样保留。
+    """
+    # 快速路径：绝大多数配置字符串不含占位符
+    start = s.find('${')
+    if start == -1:
+        return s
+
+    n = len(s)
+    parts = []
+    pos = 0  # 尚未输出的字面量起点
+    while start != -1:
+        # 扫描变量名，直到 '}' 或 ':'
+        k = start + 2
+        while k < n and s[k] != '}' and s[k] != ':':
+            k += 1
+
+        end = -1
+        if k > start + 2 and k < n:
+            name = s[start + 2:k]
+            if s[k] == '}':
+                default = ""
+                end = k + 1
+            else:
+                close = s.find('}', k + 1)
+                if close > k + 1:
+                    default = s[k + 1:close]
+                    end = close + 1
+
+        if end == -1:
+            # 不构成占位符，从下一个字符继续查找
+            start = s.find('${', start + 1)
+            continue
+
+        parts.append(s[pos:start])
+        # 优先从传入的 env 查找，没有则回退到 default -> ""
+        parts.append(env.get(name, default))
+        pos = end
+        start = s.find('${', pos)
+
+    parts.append(s[pos:])
+    return ''.join(parts)
 
 @dataclass
 class AgentConfig:
@@ -17,101 +124,284 @@ class AgentConfig:
     allowed_mcp_servers: Optional[List[str]] = None
 
 
+def _resolve_config_path(config_path: str) -> str:
+    """相对路径以项目根目录为基准，解决 STDIO 模式下 CWD 不确定的问题。"""
+    if os.path.isabs(config_path):
+        return config_path
+    # src/config.py -> src -> project_root
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(current_dir)
+    return os.path.join(project_root, config_path)
+
+
 class ConfigLoader:
-    _instance = None
-    _initialized = False
-    
+    # 按配置文件绝对路径区分的单例，同一路径重复构造直接复用已解析的实例
+    _instances: Dict[str, "ConfigLoader"] = {}
+
     def __new__(cls, config_path: str = "agents.yaml"):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-    
+        instance = cls._instances.get(_resolve_config_path(config_path))
+        if instance is None:
+            instance = super().__new__(cls)
+        return instance
+
     def __init__(self, config_path: str = "agents.yaml"):
         # 防止重复初始化
-        if ConfigLoader._initialized:
+        if getattr(self, "_initialized", False):
             return
-        # 自动定位到项目根目录，解决 STDIO 模式下 CWD 不确定的问题
-        if not os.path.isabs(config_path):
-            # src/config.py -> src -> project_root
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_dir)
-            self.config_path = os.path.join(project_root, config_path)
-        else:
-            self.config_path = config_path
+        self.config_path = _resolve_config_path(config_path)
 
         self._config_cache = {}
+        # 最近一次 load_config 时配置文件的 (mtime_ns, size)
+        self._loaded_stamp: Optional[Tuple[int, int]] = None
+        # 传递性包含 ${ 占位符的 dict/list 节点 id 集合，load_config 时构建
+        self._needs_expand = set()
+        # 配置中引用到的环境变量名 (排序后)，作为解析结果缓存键的来源
+        self._referenced_env_vars = ()
+        # 解析结果缓存，load_config 时失效
+        self._agent_memo: Dict[tuple, AgentConfig] = {}
+        self._global_memo: Dict[tuple, Dict[str, Any]] = {}
+        # 多个线程可能同时读写解析结果缓存 (server 的路由线程池)，淘汰时需遍历字典，统一加锁
+        self._memo_lock = threading.Lock()
+        # Agent 名称索引，以及 permission_set 不含占位符的 Agent 预先解析好的权限
+        self._agents_by_name: Dict[str, dict] = {}
+        self._resolved_psets: Dict[str, Dict] = {}
+        # 权限集组合 -> 合并去重后的结果，load_config 时失效
+        self._pset_resolved_cache: Dict[Tuple[str, ...], Dict] = {}
+        # 模型解析只依赖 model_registry / use_preview_models，单独按其引用变量缓存
+        self._model_env_vars: Tuple[str, ...] = ()
+        self._model_memo: Dict[tuple, Dict[str, str]] = {}
         self.load_config()
-        ConfigLoader._initialized = True
+        # 加载成功后才登记，文件缺失等异常不会留下半初始化的实例
+        self._initialized = True
+        ConfigLoader._instances[self.config_path] = self
 
     def load_config(self) -> Dict[str, Any]:
         """加载原始 yaml 配置，不进行变量替换。"""
-        if not os.path.exists(self.config_path):
+        try:
+            st = os.stat(self.config_path)
+        except FileNotFoundError:
             raise FileNotFoundError(f"未找到配置文件: {self.config_path}")
 
-        with open(self.config_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        cached = _YAML_CACHE.get(self.config_path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            config, referenced = cached[2], cached[3]
+        else:
+            stamp = f"{st.st_mtime_ns}-{st.st_size}"
+            sidecar = _read_json_sidecar(self.config_path, stamp)
+            if sidecar is not None:
+                # 源文件未变化：跳过 YAML 解析，直接使用上次进程写下的 JSON 缓存
+                config, referenced = sidecar
+            else:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+
+                try:
+                    # 只按 YAML 解析结构，不处理 ${VAR}
+                    # 变量替换推迟到 get_agent_config / get_global_settings 时
+                    config = yaml.load(content, Loader=_YamlLoader)
+                except yaml.YAMLError as e:
+                    raise ValueError(f"YAML 配置解析错误: {e}")
+                # 对原始文本做一次正则扫描即可得到全部引用变量，无需逐个字符串节点匹配
+                referenced = tuple(sorted(set(_ENV_DISCOVER_RE.findall(content))))
+                _write_json_sidecar(self.config_path, stamp, config, referenced)
+            _YAML_CACHE[self.config_path] = (st.st_mtime_ns, st.st_size, config, referenced)
+
+        self._loaded_stamp = (st.st_mtime_ns, st.st_size)
+        self._config_cache = config
+        self._needs_expand = set()
+        self._mark_placeholders(config)
+        self._referenced_env_vars = referenced
+        self._agent_memo = {}
+        self._global_memo = {}
+        self._pset_resolved_cache = {}
+        self._build_agent_index(config)
+        self._build_model_index(config)
+        return config
 
+    def reload_if_changed(self) -> bool:
+        """配置文件的 (mtime, size) 与上次加载时不同则重新加载，返回是否发生了重新加载。"""
         try:
-            # 只按 YAML 解析结构，不处理 ${VAR}
-            # 变量替换推迟到 get_agent_config / get_global_settings 时
-            config = yaml.safe_load(content)
-            self._config_cache = config
-            return config
-        except yaml.YAMLError as e:
-            raise ValueError(f"YAML 配置解析错误: {e}")
-
-    def _resolve_with_env(self, value: Any, env: Dict[str, str]) -> Any:
-        """递归解析配置中的环境变量占位符。"""
-        if isinstance(value, str):
-            # 正则匹配 ${VAR} 或 ${VAR:default}
-            pattern = re.compile(r'\$\{([^}:]+)(:([^}]+))?\}')
-            
-            def env_sub(match):
-                var_name = match.group(1)
-                default_value = match.group(3)
-                # 优先从传入的 env 查找，没有则回退到 default_value -> ""
-                return env.get(var_name, default_value if default_value is not None else "")
-            
-            return pattern.sub(env_sub, value)
-        
-        elif isinstance(value, dict):
-            return {k: self._resolve_with_env(v, env) for k, v in value.items()}
-        
-        elif isinstance(value, list):
-            return [self._resolve_with_env(v, env) for v in value]
-        
+            st = os.stat(self.config_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"未找到配置文件: {self.config_path}")
+        if (st.st_mtime_ns, st.st_size) == self._loaded_stamp:
+            return False
+        self.load_config()
+        return True
+
+    def _build_agent_index(self, config: Dict[str, Any]) -> None:
+        """建立 Agent 名称索引，并预解析静态权限集（同名 Agent 以首个定义为准）。"""
+        agents_by_name = {}
+        for agent in config.get("agents") or []:
+            if isinstance(agent, dict) and "name" in agent:
+                agents_by_name.setdefault(agent["name"], agent)
+
+        permission_sets = config.get("permission_sets") or {}
+        resolved_psets = {}
+        for name, agent in agents_by_name.items():
+            pset_name = agent.get("permission_set")
+            if not pset_name or self._has_placeholder(pset_name):
+                continue
+            try:
+                resolved_psets[name] = self._resolve_permission_sets(pset_name, permission_sets)
+            except Exception:
+                # 保持原有行为：未知或格式错误的权限集在获取该 Agent 配置时再报错，不影响其他 Agent
+                continue
+
+        self._agents_by_name = agents_by_name
+        self._resolved_psets = resolved_psets
+
+    def _build_model_index(self, config: Dict[str, Any]) -> None:
+        """收集模型解析相关配置引用的环境变量；未引用任何变量时缓存键恒为空，只解析一次。"""
+        raw_global = config.get("global", {})
+        referenced = set()
+        self._mark_placeholders(raw_global.get("model_registry", {}), referenced)
+        self._mark_placeholders(raw_global.get("use_preview_models", "true"), referenced)
+        self._model_env_vars = tuple(sorted(referenced))
+        self._model_memo = {}
+
+    def _mark_placeholders(self, node: Any, referenced: Optional[set] = None) -> bool:
+        """
+        遍历一次配置树，记录包含 ${ 占位符的容器节点，返回该子树是否需要替换。
+        提供 referenced 时，同时将该子树中占位符的变量名收集进去。
+        """
+        if isinstance(node, str):
+            if '${' not in node:
+                return False
+            if referenced is not None:
+                referenced.update(_ENV_DISCOVER_RE.findall(node))
+            return True
+        if isinstance(node, dict):
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
         else:
+            return False
+
+        # 不短路：每个子容器都需要被标记
+        needs = False
+        for child in children:
+            if self._mark_placeholders(child, referenced):
+                needs = True
+        if needs:
+            self._needs_expand.add(id(node))
+        return needs
+
+    @staticmethod
+    def _merge_env(env_overrides: Optional[Mapping[str, str]]) -> Mapping[str, str]:
+        """以 ChainMap 叠加 env_overrides 与 os.environ，查找时逐层回退，无需复制整个环境。"""
+        if not env_overrides or env_overrides is os.environ:
+            return os.environ
+        return ChainMap(env_overrides, os.environ)
+
+    def _has_placeholder(self, value: Any) -> bool:
+        """判断配置节点（需来自当前配置树）是否包含待替换的占位符。"""
+        if isinstance(value, str):
+            return '${' in value
+        return id(value) in self._needs_expand
+
+    def _env_key(self, env: Mapping[str, str], names: Optional[Tuple[str, ...]] = None) -> tuple:
+        """仅取配置实际引用的环境变量取值作为缓存键，其余变量不影响解析结果。"""
+        if names is None:
+            names = self._referenced_env_vars
+        return tuple(env.get(name) for name in names)
+
+    def _memo_get(self, memo: Dict[tuple, Any], key: tuple) -> Any:
+        """读取缓存，未命中返回 None。"""
+        with self._memo_lock:
+            return memo.get(key)
+
+    def _memo_put(self, memo: Dict[tuple, Any], key: tuple, value: Any) -> None:
+        """写入缓存，超出上限时淘汰最早写入的条目。"""
+        with self._memo_lock:
+            if len(memo) >= _MEMO_MAX_ENTRIES:
+                memo.pop(next(iter(memo)), None)
+            memo[key] = value
+
+    def _resolve_with_env(self, value: Any, env: Mapping[str, str]) -> Any:
+        """
+        解析配置中的环境变量占位符。
+        不含占位符的子树直接原样返回（不复制），调用方需将结果视为只读。
+
+        使用显式栈迭代：只浅复制并深入包含占位符的 dict/list，
+        其余叶子节点与子树不产生函数调用。
+        """
+        if isinstance(value, str):
+            return _expand_env(value, env)
+
+        needs_expand = self._needs_expand
+        if id(value) not in needs_expand:
             return value
 
-    def get_global_settings(self, env_overrides: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        # 被标记的节点只可能是 dict / list；副本中的子节点仍是原始对象，id 可直接查表
+        root = value.copy()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            items = node.items() if type(node) is dict else enumerate(node)
+            # 迭代中只替换已有键/下标的值，不改变容器大小
+            for k, v in items:
+                if type(v) is str:
+                    if '${' in v:
+                        node[k] = _expand_env(v, env)
+                elif id(v) in needs_expand:
+                    child = v.copy()
+                    node[k] = child
+                    stack.append(child)
+        return root
+
+    def get_global_settings(self, env_overrides: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
         """获取全局配置，支持运行时环境覆盖。"""
         raw_global = self._config_cache.get("global", {})
         
         # 合并环境: os.environ (底座) + env_overrides (本次请求)
-        run_env = os.environ.copy()
-        if env_overrides:
-            run_env.update(env_overrides)
-            
-        return self._resolve_with_env(raw_global, run_env)
+        run_env = self._merge_env(env_overrides)
+
+        key = self._env_key(run_env)
+        cached = self._memo_get(self._global_memo, key)
+        if cached is not None:
+            return cached
+
+        settings = self._resolve_with_env(raw_global, run_env)
+        self._memo_put(self._global_memo, key, settings)
+        return settings
 
-    def resolve_model_alias(self, alias: str, env_overrides: Optional[Dict[str, str]] = None) -> str:
+    def resolve_model_alias(self, alias: str, env_overrides: Optional[Mapping[str, str]] = None) -> str:
         """将模型别名解析为具体模型名称。"""
-        global_settings = self.get_global_settings(env_overrides)
-        
-        model_registry = global_settings.get("model_registry", {})
-        use_preview_str = global_settings.get("use_preview_models", "true")
-        use_preview = str(use_preview_str).lower() == "true"
-        
-        return resolve_model(alias, model_registry, use_preview)
+        alias_table = self._alias_table(self._merge_env(env_overrides))
+        # 非别名即为具体模型名，原样返回
+        return alias_table.get(alias, alias)
+
+    def _alias_table(self, run_env: Mapping[str, str]) -> Dict[str, str]:
+        """按 model_registry / use_preview_models 引用变量的取值缓存别名表。"""
+        key = self._env_key(run_env, self._model_env_vars)
+        alias_table = self._memo_get(self._model_memo, key)
+        if alias_table is None:
+            # 只解析 model_registry / use_preview_models，而非整个 global 段
+            raw_global = self._config_cache.get("global", {})
+            model_registry = self._resolve_with_env(raw_global.get("model_registry", {}), run_env)
+            use_preview_str = self._resolve_with_env(raw_global.get("use_preview_models", "true"), run_env)
+            use_preview = str(use_preview_str).lower() == "true"
+            alias_table = build_alias_table(model_registry, use_preview)
+            self._memo_put(self._model_memo, key, alias_table)
+        return alias_table
 
     def _resolve_permission_sets(self, set_names, permission_sets: Dict) -> Dict:
         """
         解析权限集，支持组合多个权限集。
         注：权限集通常不包含需要动态替换的变量，所以逻辑不变。
         """
-        # 标准化为列表
+        # 标准化为元组，同时作为缓存键（保留顺序，工具顺序依赖权限集顺序）
         if isinstance(set_names, str):
-            set_names = [set_names]
+            set_names = (set_names,)
+        elif isinstance(set_names, (list, tuple)) and all(isinstance(n, str) for n in set_names):
+            set_names = tuple(set_names)
+        else:
+            raise ValueError(f"permission_set 格式错误: 应为权限集名称或名称列表，实际为 {set_names!r}。")
+
+        cached = self._pset_resolved_cache.get(set_names)
+        if cached is not None:
+            return cached
         
         combined_tools = []
         sandbox = False
@@ -121,7 +411,11 @@ class ConfigLoader:
                 raise ValueError(f"未找到权限集 '{set_name}'。")
             
             pset = permission_sets[set_name]
-            tools = pset.get("tools", [])
+            if not isinstance(pset, dict):
+                raise ValueError(f"权限集 '{set_name}' 格式错误: 应为映射，实际为 {pset!r}。")
+            tools = pset.get("tools") or []
+            if not isinstance(tools, list):
+                raise ValueError(f"权限集 '{set_name}' 的 tools 格式错误: 应为列表，实际为 {tools!r}。")
             combined_tools.extend(tools)
             
             # 如果任何一个权限集要求沙箱，则启用
@@ -136,17 +430,58 @@ class ConfigLoader:
                 seen.add(t)
                 unique_tools.append(t)
         
-        return {"tools": unique_tools, "sandbox": sandbox}
+        resolved = {"tools": unique_tools, "sandbox": sandbox}
+        self._pset_resolved_cache[set_names] = resolved
+        return resolved
+
+    def list_agent_names(self) -> List[str]:
+        """按配置顺序返回全部 Agent 名称。"""
+        return list(self._agents_by_name)
 
-    def get_agent_config(self, agent_name: str, env_overrides: Optional[Dict[str, str]] = None) -> AgentConfig:
-        """获取特定 Agent 的配置对象，支持运行时配置覆盖。"""
-        # 合并环境
-        run_env = os.environ.copy()
-        if env_overrides:
-            run_env.update(env_overrides)
+    def get_agent_config(self, agent_name: str, env_overrides: Optional[Mapping[str, str]] = None) -> AgentConfig:
+        """
+        获取特定 Agent 的配置对象，支持运行时配置覆盖。
+        结果按 (agent_name, 引用变量取值) 缓存，调用方需将返回对象视为只读。
+        """
+        return self.get_agents_bulk([agent_name], env_overrides)[agent_name]
+
+    def get_agents_bulk(self, agent_names: List[str],
+                        env_overrides: Optional[Mapping[str, str]] = None) -> Dict[str, AgentConfig]:
+        """
+        批量获取多个 Agent 的配置：环境合并、缓存键与模型别名表都只计算一次，
+        重复的名称只解析一次。返回 {agent_name: AgentConfig}，任一 Agent 不存在时抛出 ValueError。
+        """
+        run_env = self._merge_env(env_overrides)
+        env_key = self._env_key(run_env)
+        alias_table = None
+
+        configs: Dict[str, AgentConfig] = {}
+        for agent_name in dict.fromkeys(agent_names):
+            key = (agent_name, env_key)
+            agent_config = self._memo_get(self._agent_memo, key)
+            if agent_config is None:
+                if alias_table is None:
+                    alias_table = self._alias_table(run_env)
+                agent_config = self._build_agent_config(agent_name, run_env, alias_table)
+                self._memo_put(self._agent_memo, key, agent_config)
+            configs[agent_name] = agent_config
+        return configs
+
+    def get_agent_description(self, agent_name: str,
+                              env_overrides: Optional[Mapping[str, str]] = None) -> Optional[str]:
+        """
+        仅解析 Agent 的 description 字段，不展开权限集、不解析模型。
+        Agent 不存在或未配置 description 时返回 None。
+        """
+        raw_agent_def = self._agents_by_name.get(agent_name)
+        if not raw_agent_def or "description" not in raw_agent_def:
+            return None
+        return self._resolve_with_env(raw_agent_def["description"], self._merge_env(env_overrides))
 
-        agents = self._config_cache.get("agents", [])
-        raw_agent_def = next((a for a in agents if a["name"] == agent_name), None)
+    def _build_agent_config(self, agent_name: str, run_env: Mapping[str, str],
+                            alias_table: Dict[str, str]) -> AgentConfig:
+        """根据合并后的环境构建 AgentConfig（无缓存）。"""
+        raw_agent_def = self._agents_by_name.get(agent_name)
         
         if not raw_agent_def:
             raise ValueError(f"配置中未找到 Agent '{agent_name}'。")
@@ -155,21 +490,23 @@ class ConfigLoader:
         agent_def = self._resolve_with_env(raw_agent_def, run_env)
 
         # 解析权限
-        permission_sets = self._config_cache.get("permission_sets", {})
+        permission_sets = self._config_cache.get("permission_sets") or {}
         pset_name = agent_def.get("permission_set")
         
         tools = []
         sandbox = False
         
         if pset_name:
-            pset = self._resolve_permission_sets(pset_name, permission_sets)
+            pset = self._resolved_psets.get(agent_name)
+            if pset is None:
+                pset = self._resolve_permission_sets(pset_name, permission_sets)
             tools = pset.get("tools", [])
             sandbox = pset.get("sandbox", False)
         
         # 模型解析: 别名 -> 具体模型名
         model_alias = agent_def.get("model") or "auto"
-        # 传入 env_overrides 确保 resolve_model_alias 能读到最新配置
-        resolved_model = self.resolve_model_alias(model_alias, env_overrides)
+        # 别名表由调用方按同一 run_env 预先解析，非别名即为具体模型名
+        resolved_model = alias_table.get(model_alias, model_alias)
         
         return AgentConfig(
             name=agent_def["name"],
@@ -3,15 +3,26 @@ import json
 import os
 import sys
 import shutil
-from typing import List, Dict, Optional, Any, Set
+import functools
+import weakref
+from typing import List, Dict, Optional, Any, Mapping
 from loguru import logger
 import loguru
 import psutil
 import time
 
+# 优先使用 orjson 解析 CLI 输出 (C 实现，更快)，未安装时回退到标准库
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，异常处理无需区分
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
-# 全局进程登记册：追踪所有由 launcher 启动的子进程
-_active_processes: Set[subprocess.Popen] = set()
+
+# 全局进程登记册：追踪所有由 launcher 启动的子进程 (PID -> Popen)
+# 弱引用字典：run() 结束后 Popen 对象被回收，条目自动移除，无需显式 discard
+_active_processes: "weakref.WeakValueDictionary[int, subprocess.Popen]" = weakref.WeakValueDictionary()
 
 
 def cleanup_all_processes(timeout: int = 5) -> int:
@@ -28,7 +39,7 @@ def cleanup_all_processes(timeout: int = 5) -> int:
     """
     cleaned_count = 0
     
-    for proc in list(_active_processes):
+    for pid, proc in list(_active_processes.items()):
         try:
             # 检查进程是否仍在运行
             if proc.poll() is None:
@@ -40,13 +51,13 @@ def cleanup_all_processes(timeout: int = 5) -> int:
                     for child in children:
                         try:
                             child.terminate()
-                            logger.debug(f"终止子进程: {child.pid}")
+                            logger.debug("终止子进程: {}", child.pid)
                         except psutil.NoSuchProcess:
                             pass
                     
                     # 再终止父进程
                     parent.terminate()
-                    logger.debug(f"终止父进程: {parent.pid}")
+                    logger.debug("终止父进程: {}", parent.pid)
                     
                     # 等待优雅终止
                     gone, alive = psutil.wait_procs([parent] + children, timeout=timeout)
@@ -55,7 +66,7 @@ def cleanup_all_processes(timeout: int = 5) -> int:
                     for p in alive:
                         try:
                             p.kill()
-                            logger.warning(f"强制杀死进程: {p.pid}")
+                            logger.warning("强制杀死进程: {}", p.pid)
                         except psutil.NoSuchProcess:
                             pass
                     
@@ -66,34 +77,56 @@ def cleanup_all_processes(timeout: int = 5) -> int:
                     pass
                     
         except Exception as e:
-            logger.error(f"清理进程时出错: {e}")
+            logger.error("清理进程时出错: {}", e)
         finally:
-            _active_processes.discard(proc)
+            _active_processes.pop(pid, None)
     
     if cleaned_count > 0:
-        logger.info(f"已清理 {cleaned_count} 个进程")
+        logger.info("已清理 {} 个进程", cleaned_count)
     
     return cleaned_count
 
 
+@functools.lru_cache(maxsize=8)
+def _which_gemini(search_path: Optional[str]) -> Optional[str]:
+    """在 PATH 中查找 gemini 可执行文件，按 PATH 取值缓存，避免每次实例化都遍历 PATH。"""
+    return (shutil.which("gemini", path=search_path)
+            or shutil.which("gemini.cmd", path=search_path)
+            or shutil.which("gemini.ps1", path=search_path))
+
+
+def _decode(data: bytes) -> str:
+    """将子进程输出解码为文本（用于日志与错误信息，非法字节替换而非报错）。"""
+    return data.decode('utf-8', errors='replace')
+
+
 class GeminiLauncherError(Exception):
     pass
 
 class GeminiLauncher:
-    def __init__(self, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None):
+    def __init__(self, cwd: Optional[str] = None, env: Optional[Mapping[str, str]] = None,
+                 overrides: Optional[Dict[str, str]] = None):
         """
         初始化启动器。
         
         Args:
             cwd: Gemini 进程的当前工作目录（必须显式提供）。
-            env: 传递给进程的环境变量。
+            env: 传递给进程的环境变量，默认为 os.environ。只持有引用且不会被修改，调用方无需预先复制；
+                 os.environ / ChainMap 等非 dict 映射在每次 run() 时才物化，
+                 实例被长期复用时也能看到进程环境的后续变化。
+            overrides: env 中相对 os.environ 的请求级覆盖项，仅用于日志，避免每次计算差集。
         """
         # CWD 必须由调用方显式提供，不使用 os.getcwd() 回退
         if not cwd:
             raise ValueError("GeminiLauncher 要求显式提供 cwd 参数")
         self.cwd = cwd
-        self.env = env or os.environ.copy()
-        self._gemini_executable = self._find_gemini_executable()
+        self.env = env if env else os.environ
+        self._overrides_for_logging = overrides
+
+    @property
+    def _gemini_executable(self) -> str:
+        """每次按当前环境查找 (PATH 查找结果已按 PATH 取值缓存)，PATH 变化后立即生效。"""
+        return self._find_gemini_executable()
 
     def _find_gemini_executable(self) -> str:
         """
@@ -105,14 +138,21 @@ class GeminiLauncher:
         if "GEMINI_EXECUTABLE" in self.env:
             return self.env["GEMINI_EXECUTABLE"]
 
-        # 2. 从 PATH 中查找
-        executable = shutil.which("gemini") or shutil.which("gemini.cmd") or shutil.which("gemini.ps1")
+        # 2. 从 PATH 中查找 (结果按 PATH 缓存)
+        executable = _which_gemini(os.environ.get("PATH"))
         if executable:
             return executable
 
         # 3. 回退到默认命令名（需确保 gemini 在 PATH 中）
         return "gemini"
 
+    def _env_override_names(self, run_env: Dict[str, str], extra_env: Dict[str, str]) -> List[str]:
+        """列出本次运行的环境变量覆盖项（仅用于 DEBUG 日志）。"""
+        if self._overrides_for_logging is None:
+            # 调用方未提供覆盖项时回退到差集计算
+            return list(run_env.keys() - os.environ.keys())
+        return list(self._overrides_for_logging) + list(extra_env)
+
     def run(self, 
             prompt: str, 
             system_prompt: Optional[str] = None,
@@ -157,19 +197,27 @@ class GeminiLauncher:
         
         final_prompt = prompt
         
-        # 关键修复：创建环境副本，避免并发请求修改同一个 self.env 导致竞争条件
-        run_env = self.env.copy()
+        # 本次运行需要追加的环境变量
+        extra_env: Dict[str, str] = {}
         
         if system_prompt:
             # 此时 system_prompt 应该是一个文件路径
             sys_prompt_path = os.path.abspath(system_prompt)
             
+            # 每次请求都检查一次 (单次 stat)：文件可能在运行期间被删除或重命名
             if os.path.exists(sys_prompt_path):
-                logger.debug(f"使用 System Prompt 文件: {sys_prompt_path}")
+                logger.debug("使用 System Prompt 文件: {}", sys_prompt_path)
                 # 设置局部的环境变量指向该文件，不影响其他并发请求
-                run_env["GEMINI_SYSTEM_MD"] = sys_prompt_path
+                extra_env["GEMINI_SYSTEM_MD"] = sys_prompt_path
             else:
-                logger.warning(f"未找到 System Prompt 文件: {sys_prompt_path}. 忽略。")
+                logger.warning("未找到 System Prompt 文件: {}. 忽略。", sys_prompt_path)
+        
+        # self.env 为 dict 且无需追加变量时直接使用；否则在此物化为局部副本。
+        # 从不原地修改 self.env，避免并发请求之间的竞争条件
+        if extra_env or not isinstance(self.env, dict):
+            run_env = {**self.env, **extra_env}
+        else:
+            run_env = self.env
         
         # 工具白名单: 通过 --allowed-tools 传递 (无需 settings.json)
         # 这些工具将被允许静默执行，其他工具会被拒绝（非交互模式）
@@ -178,7 +226,7 @@ class GeminiLauncher:
                 cmd.extend(["--allowed-tools", tool])
             # 使用 default 模式：仅允许白名单中的工具，其他工具需确认（非交互模式被拒绝）
             cmd.extend(["--approval-mode", "default"])
-            logger.debug(f"工具白名单: {tools}")
+            logger.debug("工具白名单: {}", tools)
         
         if include_directories:
             for d in include_directories:
@@ -198,16 +246,18 @@ class GeminiLauncher:
             
             logger.info("=" * 60)
             logger.info("开始执行 Gemini CLI")
-            logger.debug(f"工作目录: {self.cwd}")
-            logger.debug(f"可执行文件: {self._gemini_executable}")
-            logger.debug(f"完整命令: {' '.join(cmd)}")
-            logger.debug(f"模型: {model or 'default'}")
-            logger.debug(f"输出格式: {output_format}")
-            logger.debug(f"沙箱模式: {sandbox}")
-            logger.debug(f"超时设置: {timeout_seconds}s")
-            logger.debug(f"Prompt 长度: {len(final_prompt)} 字符")
-            logger.debug(f"工具白名单数量: {len(tools) if tools else 0}")
-            logger.debug(f"环境变量覆盖: {list(run_env.keys() - os.environ.keys())}")
+            # DEBUG 日志使用延迟格式化：sink 未启用 DEBUG 时不拼接字符串、不计算差集
+            lazy_logger = logger.opt(lazy=True)
+            logger.debug("工作目录: {}", self.cwd)
+            logger.debug("可执行文件: {}", self._gemini_executable)
+            lazy_logger.debug("完整命令: {}", lambda: ' '.join(cmd))
+            logger.debug("模型: {}", model or 'default')
+            logger.debug("输出格式: {}", output_format)
+            logger.debug("沙箱模式: {}", sandbox)
+            logger.debug("超时设置: {}s", timeout_seconds)
+            logger.debug("Prompt 长度: {} 字符", len(final_prompt))
+            logger.debug("工具白名单数量: {}", len(tools) if tools else 0)
+            lazy_logger.debug("环境变量覆盖: {}", lambda: self._env_override_names(run_env, extra_env))
             
             # 使用 Popen 替代 run，以便手动管理超时和进程树杀死
             process = subprocess.Popen(
@@ -217,23 +267,22 @@ class GeminiLauncher:
                 stdin=subprocess.DEVNULL,  # 关键：不继承父进程的 stdin，防止 MCP 管道冲突
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8',
+                # 二进制读取：stdout 直接交给 JSON 解析器，跳过 TextIOWrapper 的整段解码
                 # Windows: 创建新进程组，方便后续整棵树杀死
                 creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
             )
             
-            logger.debug(f"进程已启动 (PID: {process.pid})")
+            logger.debug("进程已启动 (PID: {})", process.pid)
             
-            # 注册进程到全局登记册
-            _active_processes.add(process)
+            # 注册进程到全局登记册 (进程对象被回收后自动注销)
+            _active_processes[process.pid] = process
             
             try:
                 stdout, stderr = process.communicate(timeout=timeout_seconds)
                 elapsed_time = time.time() - start_time
             except subprocess.TimeoutExpired:
                 elapsed_time = time.time() - start_time
-                logger.error(f"❌ 超时失败 ({elapsed_time:.2f}s / {timeout_seconds}s)")
+                logger.error("❌ 超时失败 ({:.2f}s / {}s)", elapsed_time, timeout_seconds)
                 logger.error("正在强制终止进程树...")
                 # 使用 psutil 安全地杀死进程树
                 try:
@@ -245,11 +294,11 @@ class GeminiLauncher:
                         except psutil.NoSuchProcess:
                             pass
                     parent.kill()
-                    logger.info(f"已杀死父进程 PID {process.pid}")
+                    logger.info("已杀死父进程 PID {}", process.pid)
                 except psutil.NoSuchProcess:
                     pass
                 except Exception as kill_err:
-                    logger.warning(f"无法杀死进程树: {kill_err}")
+                    logger.warning("无法杀死进程树: {}", kill_err)
                     process.kill()  # Fallback
                 
                 # 清理残留的 communicate
@@ -263,27 +312,29 @@ class GeminiLauncher:
             # ============================================================
             # 日志 - 执行后
             # ============================================================
-            logger.info(f"✅ CLI 执行完成 (耗时: {elapsed_time:.2f}s, 退出码: {process.returncode})")
+            logger.info("✅ CLI 执行完成 (耗时: {:.2f}s, 退出码: {})", elapsed_time, process.returncode)
             
             # 详细记录 stdout 和 stderr（即使成功也记录）
+            # stdout/stderr 均为 bytes，仅在需要文本时解码
             if stdout:
-                logger.debug(f"STDOUT 长度: {len(stdout)} 字符")
-                logger.debug(f"STDOUT 内容:\n{stdout[:1000]}")  # 记录前 1000 字符
+                logger.debug("STDOUT 长度: {} 字节", len(stdout))
+                lazy_logger.debug("STDOUT 内容:\n{}", lambda: _decode(stdout[:1000]))  # 记录前 1000 字节
                 if len(stdout) > 1000:
-                    logger.debug(f"... (STDOUT 已截断，完整长度: {len(stdout)})")
+                    logger.debug("... (STDOUT 已截断，完整长度: {})", len(stdout))
             else:
                 logger.warning("⚠️  STDOUT 为空！")
             
-            if stderr:
-                logger.debug(f"STDERR 长度: {len(stderr)} 字符")
-                logger.warning(f"STDERR 内容:\n{stderr[:1000]}")  # 警告级别，因为通常 stderr 有内容就需要关注
-                if len(stderr) > 1000:
-                    logger.debug(f"... (STDERR 已截断，完整长度: {len(stderr)})")
+            stderr_text = _decode(stderr) if stderr else ""
+            if stderr_text:
+                logger.debug("STDERR 长度: {} 字符", len(stderr_text))
+                logger.warning("STDERR 内容:\n{}", stderr_text[:1000])  # 警告级别，因为通常 stderr 有内容就需要关注
+                if len(stderr_text) > 1000:
+                    logger.debug("... (STDERR 已截断，完整长度: {})", len(stderr_text))
             
             if process.returncode != 0:
-                error_msg = stderr.strip() or stdout.strip()
-                logger.error(f"❌ CLI 执行失败 (退出码: {process.returncode})")
-                logger.error(f"错误信息: {error_msg[:500]}")
+                error_msg = stderr_text.strip() or _decode(stdout).strip()
+                logger.error("❌ CLI 执行失败 (退出码: {})", process.returncode)
+                logger.error("错误信息: {}", error_msg[:500])
                 raise GeminiLauncherError(f"Gemini CLI exited with code {process.returncode}: {error_msg}")
             
             stdout = stdout.strip()
@@ -292,21 +343,24 @@ class GeminiLauncher:
                 try:
                     if not stdout:
                         logger.error("❌ JSON 解析失败: stdout 为空字符串")
-                        logger.error(f"完整 STDERR: {stderr}")
+                        logger.error("完整 STDERR: {}", stderr_text)
                         raise GeminiLauncherError("Gemini CLI returned empty output. Check stderr for details.")
                     
-                    data = json.loads(stdout)
+                    # orjson / json 均可直接解析 bytes
+                    data = _json_loads(stdout)
                     if "error" in data:
                         raise GeminiLauncherError(f"Gemini API Error: {data['error'].get('message', 'Unknown error')}")
                     response_text = data.get("response", "")
-                    logger.success(f"✅ 解析成功: 响应长度 {len(response_text)} 字符")
+                    logger.success("✅ 解析成功: 响应长度 {} 字符", len(response_text))
                     return response_text
                 except json.JSONDecodeError as e:
-                    logger.error(f"❌ JSON 解析错误: {e}")
-                    logger.error(f"原始输出 (前 500 字符): {stdout[:500]}")
-                    raise GeminiLauncherError(f"Failed to parse JSON output.\nRaw: {stdout[:500]}...\nError: {e}")
+                    raw_preview = _decode(stdout[:500])
+                    logger.error("❌ JSON 解析错误: {}", e)
+                    logger.error("原始输出 (前 500 字节): {}", raw_preview)
+                    raise GeminiLauncherError(f"Failed to parse JSON output.\nRaw: {raw_preview}...\nError: {e}")
             
-            return stdout
+            # 非 JSON 输出：解码并与原 text 模式一致地统一换行符
+            return stdout.decode('utf-8').replace('\r\n', '\n')
 
         except GeminiLauncherError:
             raise  # Re-raise our own errors
@@ -314,9 +368,5 @@ class GeminiLauncher:
              raise GeminiLauncherError(f"Executable '{self._gemini_executable}' not found.")
         except Exception as e:
             raise GeminiLauncherError(f"Unexpected error: {str(e)}")
-        finally:
-            # 无论成功失败，都从登记册移除进程
-            if 'process' in locals():
-                _active_processes.discard(process)
 
 # End of file
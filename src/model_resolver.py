@@ -7,6 +7,9 @@
 
 from typing import Dict, Any
 
+# 支持的模型别名，其余名称视为具体模型名原样返回
+MODEL_ALIASES = ('auto', 'pro', 'flash', 'flash-lite')
+
 
 def resolve_model(
     alias: str, 
@@ -38,3 +41,12 @@ def resolve_model(
     else:
         # 已经是具体名称，直接返回
         return alias
+
+
+def build_alias_table(registry: Dict[str, Any], use_preview: bool = True) -> Dict[str, str]:
+    """
+    预先解析所有别名，返回 {别名: 具体模型名}。
+    
+    未收录在表中的名称即为具体模型名，查表时原样返回即可，与 resolve_model 一致。
+    """
+    return {alias: resolve_model(alias, registry, use_preview) for alias in MODEL_ALIASES}
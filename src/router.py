@@ -1,11 +1,82 @@
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Set, Mapping
 import os
+import threading
+from collections import ChainMap
 from .config import ConfigLoader
 from .launcher import GeminiLauncher, GeminiLauncherError
+from loguru import logger
+
+# Launcher 复用池的最大条目数（按 cwd + 请求级环境覆盖计）
+_LAUNCHER_POOL_MAX = 64
 
 class AgentRouter:
-    def __init__(self, config_path: str = "agents.yaml"):
+    def __init__(self, config_path: str = "agents.yaml", base_dir: Optional[str] = None):
+        # ConfigLoader 按路径单例，重复创建 Router 时直接复用已解析的配置；
+        # 仅当配置文件 (mtime, size) 变化时才重新加载
         self.config_loader = ConfigLoader(config_path)
+        self.config_loader.reload_if_changed()
+        # 相对路径的 system_prompt 以 base_dir 为基准 (默认为配置文件所在目录)，不依赖进程 CWD
+        self.base_dir = os.path.abspath(base_dir or os.path.dirname(self.config_loader.config_path))
+        # 已确认存在的工作目录，避免每次请求重复 stat / makedirs
+        self._known_good_cwds: Set[str] = set()
+        # GeminiLauncher 复用池: (cwd, 请求级环境覆盖) -> launcher
+        # run() 不修改实例状态，可安全地在并发请求间共享
+        self._launcher_pool: Dict[tuple, GeminiLauncher] = {}
+        self._launcher_pool_lock = threading.Lock()
+        self._preload_agents()
+
+    def _preload_agents(self) -> None:
+        """
+        启动时按当前 os.environ 预先解析全部 Agent 配置并写入 ConfigLoader 缓存，
+        不带请求级覆盖 (或覆盖未改变引用变量) 的请求直接命中缓存。
+        """
+        for agent_name in self.config_loader.list_agent_names():
+            try:
+                self.config_loader.get_agent_config(agent_name)
+            except ValueError as e:
+                # 配置有误的 Agent 留到请求时再向调用方报告，不影响其他 Agent 启动
+                logger.debug("预加载 Agent '{}' 失败: {}", agent_name, e)
+
+    def _resolve_prompt_path(self, system_prompt: Optional[str]) -> Optional[str]:
+        """将相对路径的 system_prompt 解析为基于 base_dir 的绝对路径。"""
+        if not system_prompt or os.path.isabs(system_prompt):
+            return system_prompt
+        return os.path.join(self.base_dir, system_prompt)
+
+    def _ensure_cwd(self, cwd: str, recheck: bool = False) -> Optional[str]:
+        """
+        确保工作目录存在，已确认的目录记录在 _known_good_cwds 中，不再重复 stat / makedirs。
+        recheck=True 用于目录在运行期间被外部删除后，忽略记录重新创建。失败时返回错误信息。
+        """
+        if recheck or cwd not in self._known_good_cwds:
+            try:
+                os.makedirs(cwd, exist_ok=True)
+            except Exception as e:
+                self._known_good_cwds.discard(cwd)
+                return f"[SUB-AGENT ERROR] 无法创建工作目录 '{cwd}': {e}"
+            self._known_good_cwds.add(cwd)
+        return None
+
+    def _get_launcher(self, cwd: str, env_vars: Dict[str, str], run_env: Mapping[str, str]) -> GeminiLauncher:
+        """
+        按 (cwd, env_vars) 复用 GeminiLauncher，仅对与 os.environ 的差异部分做哈希。
+        launcher 持有 run_env (os.environ 或叠加其上的 ChainMap) 的引用，每次运行时才物化，
+        进程环境的后续变化 (PATH、GEMINI_* 等) 对已复用的 launcher 同样生效。
+        """
+        try:
+            key = (cwd, frozenset(env_vars.items()))
+        except TypeError:
+            # 覆盖值不可哈希，放弃复用
+            return GeminiLauncher(cwd=cwd, env=run_env, overrides=env_vars)
+
+        with self._launcher_pool_lock:
+            launcher = self._launcher_pool.get(key)
+            if launcher is None:
+                if len(self._launcher_pool) >= _LAUNCHER_POOL_MAX:
+                    self._launcher_pool.pop(next(iter(self._launcher_pool)))
+                launcher = GeminiLauncher(cwd=cwd, env=run_env, overrides=env_vars)
+                self._launcher_pool[key] = launcher
+        return launcher
     
     def route_request(self, 
                       agent_name: str, 
@@ -39,8 +110,8 @@ class AgentRouter:
 
         # 1. 准备运行时环境 (Base Env + Request Overrides)
         # 这是为了确保 ConfigLoader 能解析出基于当前请求的配置（如模型别名）
-        run_env = os.environ.copy()
-        run_env.update(env_vars)
+        # 使用 ChainMap 叠加而非复制 os.environ；只有创建 launcher 时才物化为 dict
+        run_env = ChainMap(env_vars, os.environ) if env_vars else os.environ
 
 
         # 2. 加载 Agent 配置 (传入 run_env 以支持动态变量替换)
@@ -73,14 +144,12 @@ class AgentRouter:
             return "[SUB-AGENT ERROR] 未指定工作目录 (CWD)。请在 Header 中设置 SUB_AGENT_CWD 或在环境变量中配置。"
 
         # 确保目录存在 (自动为 Agent 准备工作区)
-        if not os.path.exists(final_cwd):
-            try:
-                os.makedirs(final_cwd, exist_ok=True)
-            except Exception as e:
-                return f"[SUB-AGENT ERROR] 无法创建工作目录 '{final_cwd}': {e}"
+        cwd_error = self._ensure_cwd(final_cwd)
+        if cwd_error:
+            return cwd_error
 
-        # 4. 初始化启动器
-        launcher = GeminiLauncher(cwd=final_cwd, env=run_env)
+        # 4. 获取启动器 (按 cwd + 环境覆盖复用)
+        launcher = self._get_launcher(final_cwd, env_vars, run_env)
         
         # 5. 执行
         try:
@@ -89,9 +158,9 @@ class AgentRouter:
             global_include_dirs = global_settings.get("include_directories", [])
             timeout_seconds = int(global_settings.get("timeout_seconds", 120))
             
-            response = launcher.run(
+            run_kwargs = dict(
                 prompt=instruction,
-                system_prompt=agent_config.system_prompt,
+                system_prompt=self._resolve_prompt_path(agent_config.system_prompt),
                 tools=agent_config.tools,
                 model=effective_model,
                 include_directories=global_include_dirs,
@@ -101,6 +170,17 @@ class AgentRouter:
                 allowed_mcp_servers=agent_config.allowed_mcp_servers
             )
             
+            try:
+                response = launcher.run(**run_kwargs)
+            except GeminiLauncherError:
+                # 已确认过的工作目录在运行期间被外部删除：重建后重试一次
+                if os.path.isdir(final_cwd):
+                    raise
+                cwd_error = self._ensure_cwd(final_cwd, recheck=True)
+                if cwd_error:
+                    return cwd_error
+                response = launcher.run(**run_kwargs)
+            
             return response
 
         except GeminiLauncherError as e:
@@ -113,8 +193,7 @@ class AgentRouter:
             else:
                 return f"[SUB-AGENT ERROR] 执行失败，请稍后重试。详情: {error_str}"
         except Exception as e:
-            from loguru import logger
-            logger.exception(f"route_request 发生未预期异常: {e}")
+            logger.exception("route_request 发生未预期异常: {}", e)
             return "[SUB-AGENT ERROR] 内部错误，请稍后重试。"
 
 # End of file
@@ -35,10 +35,14 @@ from typing import Optional, Dict, Any
 import argparse
 import os
 import signal
+import warnings
 import atexit
-import anyio
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from loguru import logger
-from dotenv import load_dotenv
+from dotenv import load_dotenv, find_dotenv
 import logging
 
 # 重定向标准 logging 到文件 (防止污染 stdout/stderr)
@@ -78,10 +82,11 @@ def _cleanup_on_exit():
     """Server 退出时清理所有活跃子进程"""
     logger.info("Server 正在退出，清理子进程...")
     cleanup_all_processes()
+    _ROUTER_POOL.shutdown(wait=False, cancel_futures=True)
 
 def _signal_handler(signum, frame):
     """处理 SIGINT/SIGTERM 信号"""
-    logger.warning(f"收到信号 {signum}，正在优雅退出...")
+    logger.warning("收到信号 {}，正在优雅退出...", signum)
     _cleanup_on_exit()
     sys.exit(0)
 
@@ -92,13 +97,14 @@ signal.signal(signal.SIGTERM, _signal_handler)
 # ============================================================
 # 配置路径解析
 # ============================================================
+@functools.cache
 def get_config_path(config_arg: str = "agents.yaml") -> str:
-    """智能解析配置文件路径"""
+    """智能解析配置文件路径（结果缓存，main() 启动时会清空）"""
     if os.path.isabs(config_arg):
         return config_arg
     potential_path = os.path.join(project_root, config_arg)
     if os.path.exists(potential_path):
-        logger.info(f"已解析配置路径: {potential_path}")
+        logger.info("已解析配置路径: {}", potential_path)
         return potential_path
     return config_arg
 
@@ -107,6 +113,12 @@ def get_config_path(config_arg: str = "agents.yaml") -> str:
 # ============================================================
 router: Optional[AgentRouter] = None  # 在 main() 中初始化
 
+# Agent 调用专用线程池，长时间的 CLI 子进程等待不占用 anyio 默认线程池的容量
+_ROUTER_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SUB_AGENT_ROUTER_WORKERS", "8")),
+    thread_name_prefix="router",
+)
+
 # 创建 MCP Server (启用后台任务)
 mcp = FastMCP(
     "Sub-Agents",
@@ -134,20 +146,27 @@ def _resolve_request_config_dict() -> Dict[str, Any]:
     headers = get_http_headers()
     
     # 调试用：记录请求 Header（生产环境可移除）
-    logger.debug(f"收到请求 Headers: {dict(headers)}")
+    logger.opt(lazy=True).debug("收到请求 Headers: {}", lambda: dict(headers))
 
-    # 1. 默认上下文
     # CWD 不使用 os.getcwd() 作为回退，避免在 MCP 模式下使用不可控的目录
-    cwd = os.environ.get("SUB_AGENT_CWD")
+    return _parse_config_header(headers.get(_CONFIG_HEADER_KEY), os.environ.get("SUB_AGENT_CWD"))
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_config_header(config_json_str: Optional[str], default_cwd: Optional[str]) -> Dict[str, Any]:
+    """
+    解析 Header 中的 JSON 配置，按 (Header 原文, 默认 CWD) 缓存。
+    同一客户端连续调用时 Header 不变，直接复用结果；返回值被多个请求共享，调用方不得修改。
+    """
+    # 1. 默认上下文
+    cwd = default_cwd
     env_vars = {}
     
     # 2. 尝试从 Header 读取 JSON 配置
-    config_json_str = headers.get(_CONFIG_HEADER_KEY)
-    
     if config_json_str:
         try:
             config_dict = json.loads(config_json_str)
-            logger.debug(f"从 Header 加载配置: {list(config_dict.keys())}")
+            logger.opt(lazy=True).debug("从 Header 加载配置: {}", lambda: list(config_dict.keys()))
             
             # 提取 CWD
             if "SUB_AGENT_CWD" in config_dict:
@@ -157,7 +176,7 @@ def _resolve_request_config_dict() -> Dict[str, Any]:
             env_vars = {k: str(v) for k, v in config_dict.items() if v is not None}
                     
         except json.JSONDecodeError as e:
-            logger.warning(f"Header JSON 解析失败: {e}，使用默认配置")
+            logger.warning("Header JSON 解析失败: {}，使用默认配置", e)
     
     return {
         "cwd": cwd,
@@ -169,68 +188,84 @@ def _resolve_request_config_dict() -> Dict[str, Any]:
 # ============================================================
 
 # 加载配置以获取动态描述
+# 只读取各 Agent 的 description 字段；完整的 AgentConfig 由 AgentRouter 创建时统一预先解析并缓存
+# 启动时的环境变量只快照一次，所有描述共享同一份只读视图
+_ENV_SNAPSHOT = MappingProxyType(dict(os.environ))
+
 try:
     from src.config import ConfigLoader
     _config_loader = ConfigLoader()
-    # 注意: 这里使用 os.environ 是为了在 Server 启动时解析尽可能多的默认值
-    # 真正的运行时配置会在 route_request 时再次解析
-    _reviewer_config = _config_loader.get_agent_config("reviewer", env_overrides=os.environ.copy())
-    _explorer_config = _config_loader.get_agent_config("explorer", env_overrides=os.environ.copy())
-    _doc_keeper_config = _config_loader.get_agent_config("doc_keeper", env_overrides=os.environ.copy())
-    
-    _REVIEWER_DESC = _reviewer_config.description
-    _EXPLORER_DESC = _explorer_config.description
-    _DOC_KEEPER_DESC = _doc_keeper_config.description
 except Exception as e:
-    logger.warning(f"从 agents.yaml 加载动态描述失败: {e}")
-    _REVIEWER_DESC = "审查代码中的缺陷（Bug、逻辑漏洞、安全风险、边界问题）。"
-    _EXPLORER_DESC = "理解现有代码结构、追踪逻辑流程或查找定义位置。"
-    _DOC_KEEPER_DESC = "外部知识图书管理员，负责获取、整理并存储外部文档。"
+    logger.warning("从 agents.yaml 加载动态描述失败: {}", e)
+    _config_loader = None
 
-@mcp.tool(description=_REVIEWER_DESC, task=TaskConfig(mode="optional"))
-async def reviewer(instruction: str) -> str:
-    """描述信息从 agents.yaml 动态加载"""
+
+def _desc(name: str, fallback: str) -> str:
+    """从 agents.yaml 读取 Agent 描述，读取失败或未配置时使用 fallback"""
+    if _config_loader is None:
+        return fallback
+    try:
+        # 注意: 这里使用启动时的环境快照，是为了在 Server 启动时解析尽可能多的默认值
+        description = _config_loader.get_agent_description(name, env_overrides=_ENV_SNAPSHOT)
+    except Exception as e:
+        logger.warning("读取 Agent '{}' 描述失败: {}", name, e)
+        return fallback
+    return description or fallback
+
+
+async def _dispatch(agent_name: str, instruction: str) -> str:
+    """在 Agent 专用线程池中执行 route_request，参数直接透传，不额外包装闭包"""
     if not router:
         return "Error: AgentRouter not initialized"
 
     # 获取当前请求的独立配置
     req_config = _resolve_request_config_dict()
-        
-    return await anyio.to_thread.run_sync(
-        lambda: router.route_request("reviewer", instruction, request_config=req_config)
+
+    return await asyncio.get_running_loop().run_in_executor(
+        _ROUTER_POOL, router.route_request, agent_name, instruction, req_config
     )
 
+
+_REVIEWER_DESC = _desc("reviewer", "审查代码中的缺陷（Bug、逻辑漏洞、安全风险、边界问题）。")
+_EXPLORER_DESC = _desc("explorer", "理解现有代码结构、追踪逻辑流程或查找定义位置。")
+_DOC_KEEPER_DESC = _desc("doc_keeper", "外部知识图书管理员，负责获取、整理并存储外部文档。")
+
+@mcp.tool(description=_REVIEWER_DESC, task=TaskConfig(mode="optional"))
+async def reviewer(instruction: str) -> str:
+    """描述信息从 agents.yaml 动态加载"""
+    return await _dispatch("reviewer", instruction)
+
 @mcp.tool(description=_EXPLORER_DESC, task=TaskConfig(mode="optional"))
 async def explorer(instruction: str) -> str:
     """描述信息从 agents.yaml 动态加载"""
-    if not router:
-        return "Error: AgentRouter not initialized"
-
-    req_config = _resolve_request_config_dict()
-
-    return await anyio.to_thread.run_sync(
-        lambda: router.route_request("explorer", instruction, request_config=req_config)
-    )
+    return await _dispatch("explorer", instruction)
 
 @mcp.tool(description=_DOC_KEEPER_DESC, task=TaskConfig(mode="optional"))
 async def doc_keeper(instruction: str) -> str:
     """描述信息从 agents.yaml 动态加载"""
-    if not router:
-        return "Error: AgentRouter not initialized"
-
-    req_config = _resolve_request_config_dict()
-
-    return await anyio.to_thread.run_sync(
-        lambda: router.route_request("doc_keeper", instruction, request_config=req_config)
-    )
+    return await _dispatch("doc_keeper", instruction)
 
 
 # ============================================================
 # 服务器入口
 # ============================================================
-def main():
-    global router
-    
+_DOTENV_PATH: Optional[str] = None  # find_dotenv() 结果缓存，避免重复向上遍历目录
+
+
+def _load_env_file(env_file: Optional[str] = None) -> None:
+    """加载 .env 环境变量；未指定文件时只查找一次默认 .env"""
+    global _DOTENV_PATH
+    if env_file is None:
+        if _DOTENV_PATH is None:
+            _DOTENV_PATH = find_dotenv()
+        env_file = _DOTENV_PATH
+        if not env_file:
+            return
+    load_dotenv(env_file)
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """解析命令行参数"""
     parser = argparse.ArgumentParser(description="Gemini Agent Router MCP Server")
     parser.add_argument("--config", default="agents.yaml", help="agents.yaml 配置文件路径")
     parser.add_argument("--transport", default="stdio", choices=["stdio", "http"], 
@@ -238,28 +273,49 @@ def main():
     parser.add_argument("--host", default="127.0.0.1", help="HTTP 模式下的主机地址")
     parser.add_argument("--port", type=int, default=8000, help="HTTP 模式下的端口")
     parser.add_argument("-e", "--env-file", default=None, help="指定 .env 文件路径")
-    args = parser.parse_args()
+    return parser.parse_args(argv)
 
-    # 加载 .env 环境变量
-    load_dotenv(args.env_file)
 
-    config_path = get_config_path(args.config)
-    
-    # ConfigLoader 已实现单例模式，直接初始化即可
-    router = AgentRouter(config_path)
-    
-    logger.info(f"已注册工具: reviewer, explorer, doc_keeper")
+def bootstrap(config_path: str = "agents.yaml", env_file: Optional[str] = None,
+              load_env: bool = True) -> AgentRouter:
+    """
+    初始化全局 router，已初始化时直接返回。
+    测试中可传入 load_env=False 跳过 .env 查找。
+    """
+    global router
+    if router is not None:
+        return router
+
+    if load_env:
+        _load_env_file(env_file)
+
+    # ConfigLoader 按配置路径单例，与上方加载描述时的实例共享解析结果
+    router = AgentRouter(get_config_path(config_path))
     
-    if args.transport == "http":
-        logger.info(f"启动 HTTP 传输: {args.host}:{args.port}")
-        mcp.run(transport="http", host=args.host, port=args.port)
+    logger.info("已注册工具: reviewer, explorer, doc_keeper")
+    return router
+
+
+def serve(transport: str = "stdio", host: str = "127.0.0.1", port: int = 8000) -> None:
+    """启动 MCP Server"""
+    if transport == "http":
+        logger.info("启动 HTTP 传输: {}:{}", host, port)
+        mcp.run(transport="http", host=host, port=port)
     else:
         # STDIO 模式下禁用 Banner，保持协议纯净
         # 这里的 log_level 会传递给底层 Transport (debug 参数不支持 stdio)
-        import warnings
-        warnings.simplefilter("ignore")
+        # 只屏蔽 MCP 相关依赖自身发出的警告，不影响其他模块
+        warnings.filterwarnings("ignore", module=r"(mcp|fastmcp|anyio)(\.|$)")
         mcp.run(show_banner=False, log_level="ERROR")
 
 
+def main():
+    args = parse_args()
+    # 命令行可能指定了不同的配置，丢弃导入期间缓存的路径解析结果
+    get_config_path.cache_clear()
+    bootstrap(args.config, args.env_file)
+    serve(args.transport, args.host, args.port)
+
+
 if __name__ == "__main__":
     main()
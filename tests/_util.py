@@ -0,0 +1,8 @@
+"""
+测试脚本共用的小工具
+"""
+
+
+def tools_by_name(tools):
+    """将 list_tools() 的结果转为 {name: tool} 字典，便于按名称查找"""
+    return {t.name: t for t in tools}
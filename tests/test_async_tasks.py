@@ -10,6 +10,7 @@
 
 import asyncio
 import sys
+import traceback
 import os
 
 # 添加项目根目录到 sys.path
@@ -17,8 +18,6 @@ project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from fastmcp import Client
-
 
 async def test_sync_call(client):
     """测试同步调用（传统模式）"""
@@ -81,8 +80,9 @@ async def test_async_call(client):
             
     except Exception as e:
         print(f"❌ 后台调用失败: {e}")
-        import traceback
-        traceback.print_exc()
+        # 仅在调试时打印完整堆栈
+        if os.getenv("SUB_AGENT_DEBUG"):
+            traceback.print_exc()
         return False
 
 
@@ -107,6 +107,9 @@ async def test_task_capabilities(client):
 
 
 async def main():
+    # 仅在脚本运行时导入 fastmcp，避免 pytest 收集阶段承担导入开销
+    from fastmcp import Client
+
     print("=" * 60)
     print("MCP 后台任务模式测试")
     print("=" * 60)
@@ -118,19 +121,19 @@ async def main():
     
     try:
         # 导入 server 模块 (装饰器模式：直接使用 mcp 实例)
-        from src.server import mcp as server, get_config_path, AgentRouter
-        import src.server as server_module
+        from src.server import mcp as server, bootstrap
         
-        # 手动初始化 router（模拟 main() 的行为）
-        server_module.router = AgentRouter(get_config_path())
+        # 直接初始化 router（跳过命令行解析与 .env 查找）
+        bootstrap(load_env=False)
         
         print(f"✅ Server 加载成功: {server.name}")
         print(f"   tasks 配置: {getattr(server, '_tasks', 'unknown')}")
         
     except Exception as e:
         print(f"❌ Server 加载失败: {e}")
-        import traceback
-        traceback.print_exc()
+        # 仅在调试时打印完整堆栈
+        if os.getenv("SUB_AGENT_DEBUG"):
+            traceback.print_exc()
         return
     
     # 使用 Client 连接到 in-memory server
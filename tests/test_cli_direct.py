@@ -4,14 +4,18 @@ Gemini CLI 命令直接测试
 """
 
 import subprocess
+import shutil
 import sys
 import json
 
+# 模块加载时解析一次 gemini 可执行文件 (Windows 下为 gemini.cmd)，调用时无需经过 shell
+GEMINI_EXE = shutil.which("gemini") or "gemini"
+
 
 def run_gemini_test(model: str, prompt: str):
     """直接调用 Gemini CLI 测试"""
     cmd = [
-        "gemini",
+        GEMINI_EXE,
         "--model", model,
         "--output-format", "json",
         prompt
@@ -24,14 +28,14 @@ def run_gemini_test(model: str, prompt: str):
     print(f"命令: {' '.join(cmd)}")
     
     try:
-        # Windows 下使用 shell=True 确保 PATH 正确解析
+        # 直接传入参数列表，提示词中的空格不会被拆分；Windows 下不分配控制台窗口
         result = subprocess.run(
-            " ".join(cmd),
+            cmd,
             capture_output=True,
             text=True,
             timeout=60,
             encoding="utf-8",
-            shell=True
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
         )
         
         if result.returncode == 0:
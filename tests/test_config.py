@@ -4,9 +4,12 @@ ConfigLoader 单元测试
 """
 
 import os
+import json
 import pytest
 import tempfile
-from src.config import ConfigLoader, AgentConfig
+import yaml
+from src import config as config_module
+from src.config import ConfigLoader, AgentConfig, _expand_env
 
 
 class TestConfigLoader:
@@ -69,6 +72,13 @@ agents:
         with pytest.raises(FileNotFoundError):
             ConfigLoader("non_existent.yaml")
     
+    def test_yaml_loader_prefers_libyaml(self):
+        """测试 PyYAML 编译了 libyaml 时使用 C 解析器"""
+        if yaml.__with_libyaml__:
+            assert config_module._YamlLoader is yaml.CSafeLoader
+        else:
+            assert config_module._YamlLoader is yaml.SafeLoader
+    
     def test_get_global_settings(self, sample_config):
         """测试获取全局设置"""
         loader = ConfigLoader(sample_config)
@@ -103,6 +113,19 @@ permission_sets: {}
         
         del os.environ["TEST_MODEL_VAR"]
     
+    def test_expand_env_edge_cases(self):
+        """测试占位符扫描器的边界情况"""
+        env = {"A": "x", "URL": "http://h"}
+        assert _expand_env("plain", env) == "plain"
+        assert _expand_env("${A}-${A}", env) == "x-x"
+        assert _expand_env("${MISSING}", env) == ""
+        assert _expand_env("${MISSING:http://d:80}", env) == "http://d:80"
+        # 不合法的占位符原样保留
+        assert _expand_env("${}", env) == "${}"
+        assert _expand_env("${A:}", env) == "${A:}"
+        assert _expand_env("${A", env) == "${A"
+        assert _expand_env("$${A}", env) == "$x"
+    
     def test_get_agent_config(self, sample_config):
         """测试获取 Agent 配置"""
         loader = ConfigLoader(sample_config)
@@ -121,6 +144,155 @@ permission_sets: {}
         with pytest.raises(ValueError):
             loader.get_agent_config("nonexistent_agent")
     
+    def test_agent_lookup_index(self, tmp_path):
+        """测试 Agent 名称索引：同名以首个定义为准，缺少 name 的条目被忽略"""
+        config_content = """
+global:
+  model_registry: {}
+permission_sets: {}
+agents:
+  - description: "缺少 name"
+  - name: dup
+    description: "first"
+  - name: dup
+    description: "second"
+"""
+        config_file = tmp_path / "index_test.yaml"
+        config_file.write_text(config_content, encoding='utf-8')
+
+        loader = ConfigLoader(str(config_file))
+        assert loader.get_agent_config("dup").description == "first"
+
+    def test_malformed_permission_set_is_lazy(self, tmp_path):
+        """测试格式错误的权限集不影响配置加载，只在获取使用它的 Agent 时报错"""
+        config_content = """
+global:
+  model_registry: {}
+permission_sets:
+  file_read:
+  web_access:
+    tools: [web_fetch]
+agents:
+  - name: broken
+    permission_set: file_read
+  - name: good
+    permission_set: web_access
+"""
+        config_file = tmp_path / "malformed_pset.yaml"
+        config_file.write_text(config_content, encoding='utf-8')
+
+        loader = ConfigLoader(str(config_file))
+        assert loader.get_agent_config("good").tools == ["web_fetch"]
+        with pytest.raises(ValueError, match="file_read"):
+            loader.get_agent_config("broken")
+
+    def test_memo_follows_referenced_env(self, tmp_path, monkeypatch):
+        """测试解析结果缓存按引用变量取值区分，环境变量变化后返回新配置"""
+        config_content = """
+global:
+  model_registry:
+    stable:
+      flash: "gemini-2.5-flash"
+      pro: "gemini-2.5-pro"
+  use_preview_models: "false"
+agents:
+  - name: env_agent
+    description: "${AGENT_DESC:default desc}"
+    model: "${AGENT_MODEL:flash}"
+"""
+        config_file = tmp_path / "memo_env.yaml"
+        config_file.write_text(config_content, encoding='utf-8')
+        monkeypatch.delenv("AGENT_DESC", raising=False)
+        monkeypatch.delenv("AGENT_MODEL", raising=False)
+
+        loader = ConfigLoader(str(config_file))
+        agent = loader.get_agent_config("env_agent")
+        assert (agent.description, agent.model) == ("default desc", "gemini-2.5-flash")
+        # 未变化时命中缓存
+        assert loader.get_agent_config("env_agent") is agent
+
+        monkeypatch.setenv("AGENT_MODEL", "pro")
+        assert loader.get_agent_config("env_agent").model == "gemini-2.5-pro"
+
+        # 请求级覆盖同样参与缓存键
+        overridden = loader.get_agent_config("env_agent", env_overrides={"AGENT_DESC": "override"})
+        assert overridden.description == "override"
+        assert loader.get_agent_config("env_agent").description == "default desc"
+
+    def test_reload_if_changed(self, sample_config, tmp_path):
+        """测试配置文件变化后重新加载并清空解析结果缓存"""
+        config_file = tmp_path / "reload.yaml"
+        content = open(sample_config, encoding='utf-8').read()
+        config_file.write_text(content, encoding='utf-8')
+
+        loader = ConfigLoader(str(config_file))
+        assert loader.get_agent_config("test_agent").description == "测试用 Agent"
+        assert loader.reload_if_changed() is False
+
+        config_file.write_text(content.replace('"测试用 Agent"', '"测试用 Agent v2"'), encoding='utf-8')
+        assert loader.reload_if_changed() is True
+        assert loader.get_agent_config("test_agent").description == "测试用 Agent v2"
+
+    @staticmethod
+    def _fresh_loader(config_path, monkeypatch):
+        """清空进程内缓存后创建 ConfigLoader，模拟新进程启动 (只剩 JSON 缓存文件)"""
+        monkeypatch.setattr(config_module, "_YAML_CACHE", {})
+        monkeypatch.setattr(ConfigLoader, "_instances", {})
+        return ConfigLoader(config_path)
+
+    def test_sidecar_used_when_stamp_matches(self, sample_config, monkeypatch):
+        """测试 JSON 缓存首行的 mtime/size 与源文件一致时直接使用缓存内容"""
+        sidecar = sample_config + config_module._SIDECAR_SUFFIX
+        self._fresh_loader(sample_config, monkeypatch)
+        header, body = open(sidecar, encoding='utf-8').read().split("\n", 1)
+        st = os.stat(sample_config)
+        assert header == f"{config_module._SIDECAR_HEADER}{st.st_mtime_ns}-{st.st_size}"
+
+        # 篡改缓存内容但保留首行：新进程应读取缓存而非重新解析 YAML
+        data = json.loads(body)
+        data["config"]["agents"][0]["description"] = "来自缓存"
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            f.write(header + "\n" + json.dumps(data, ensure_ascii=False))
+
+        loader = self._fresh_loader(sample_config, monkeypatch)
+        assert loader.get_agent_config("test_agent").description == "来自缓存"
+
+    def test_sidecar_stale_after_yaml_edit(self, sample_config, monkeypatch):
+        """测试修改 YAML 后旧的 JSON 缓存失效，读取新值并重写缓存"""
+        self._fresh_loader(sample_config, monkeypatch)
+        content = open(sample_config, encoding='utf-8').read()
+        with open(sample_config, 'w', encoding='utf-8') as f:
+            f.write(content.replace('"测试用 Agent"', '"测试用 Agent v2"'))
+
+        loader = self._fresh_loader(sample_config, monkeypatch)
+        assert loader.get_agent_config("test_agent").description == "测试用 Agent v2"
+        st = os.stat(sample_config)
+        with open(sample_config + config_module._SIDECAR_SUFFIX, encoding='utf-8') as f:
+            assert f.readline().rstrip("\n") == f"{config_module._SIDECAR_HEADER}{st.st_mtime_ns}-{st.st_size}"
+
+    def test_sidecar_corrupt_falls_back_to_yaml(self, sample_config, monkeypatch):
+        """测试 JSON 缓存损坏时回退到解析 YAML"""
+        sidecar = sample_config + config_module._SIDECAR_SUFFIX
+        self._fresh_loader(sample_config, monkeypatch)
+        header = open(sidecar, encoding='utf-8').readline()
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            f.write(header + '{"config": {"agents": [')
+
+        loader = self._fresh_loader(sample_config, monkeypatch)
+        assert loader.get_agent_config("test_agent").description == "测试用 Agent"
+
+    def test_singleton_per_config_path(self, sample_config, tmp_path):
+        """测试单例按配置路径区分，并可批量获取 Agent 配置"""
+        loader = ConfigLoader(sample_config)
+        assert ConfigLoader(sample_config) is loader
+
+        other_file = tmp_path / "other.yaml"
+        other_file.write_text(open(sample_config, encoding='utf-8').read(), encoding='utf-8')
+        assert ConfigLoader(str(other_file)) is not loader
+
+        configs = loader.get_agents_bulk(["test_agent"])
+        assert configs["test_agent"] is loader.get_agent_config("test_agent")
+    
     def test_permission_set_combination(self, sample_config):
         """测试权限集组合"""
         loader = ConfigLoader(sample_config)
@@ -10,14 +10,19 @@ Client -> Agent Server (src/server.py) -> Router -> Gemini Launcher -> Gemini CL
 import asyncio
 import os
 import sys
+import traceback
 import shutil
 import json
+from itertools import islice
 from pathlib import Path
 
-from fastmcp import Client
-from fastmcp.client.transports import StdioTransport
+from _util import tools_by_name
 
 async def test_doc_keeper_integration():
+    # 仅在脚本运行时导入 fastmcp，避免 pytest 收集阶段承担导入开销
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+
     print("=" * 80)
     print("Doc Keeper 集成测试")
     print("=" * 80)
@@ -54,7 +59,7 @@ async def test_doc_keeper_integration():
             
             # 3. 列出工具，确认 doc_keeper 存在
             tools = await client.list_tools()
-            keeper_tool = next((t for t in tools if t.name == "doc_keeper"), None)
+            keeper_tool = tools_by_name(tools).get("doc_keeper")
             
             if not keeper_tool:
                 print("❌ 未找到 doc_keeper 工具！")
@@ -99,16 +104,17 @@ async def test_doc_keeper_integration():
                 print(expected_file.read_text(encoding='utf-8')[:200])
             else:
                 print("❌ 测试失败！文件未创建。")
-                # 打印目录树帮助调试
-                print("\n当前目录结构:")
-                for root, dirs, files in os.walk(test_cwd):
-                    for file in files:
-                        print(os.path.join(root, file))
+                # 打印知识库目录帮助调试（只列 external_knowledge，最多 50 项）
+                knowledge_root = test_cwd / "external_knowledge"
+                print(f"\n{knowledge_root} 目录结构 (最多 50 项):")
+                for path in islice(knowledge_root.rglob("*"), 50):
+                    print(path)
 
     except Exception as e:
         print(f"\n❌ 执行出错: {e}")
-        import traceback
-        traceback.print_exc()
+        # 仅在调试时打印完整堆栈
+        if os.getenv("SUB_AGENT_DEBUG"):
+            traceback.print_exc()
     finally:
         # 清理 (可选，为了查看结果暂时保留或注释掉)
         # shutil.rmtree(test_cwd, ignore_errors=True)
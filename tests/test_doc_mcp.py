@@ -10,14 +10,12 @@ Doc MCP 工具测试脚本 (V2.0)
 import asyncio
 import os
 import sys
+import traceback
 import shutil
 import tempfile
 import json
 from pathlib import Path
 
-from fastmcp import Client
-from fastmcp.client.transports import StdioTransport
-
 
 async def run_doc_mcp_tests(client, test_dir: str):
     """执行 V2 工具集测试"""
@@ -28,45 +26,46 @@ async def run_doc_mcp_tests(client, test_dir: str):
     print("1. 测试 create_knowledge (多种路径策略)")
     print("=" * 60)
     
-    # 1.1 自动生成路径 (category/slug.md)
-    res1 = await client.call_tool(
-        "create_knowledge",
-        {
-            "title": "React Hooks",
-            "category": "libs",
-            "tags": "react, frontend",
-            "description": "Introduction to React Hooks."
-        }
+    # 1.1 ~ 1.3 写入不同文件、互不依赖，并发发出
+    res1, res2, res3 = await asyncio.gather(
+        # 1.1 自动生成路径 (category/slug.md)
+        client.call_tool(
+            "create_knowledge",
+            {
+                "title": "React Hooks",
+                "category": "libs",
+                "tags": "react, frontend",
+                "description": "Introduction to React Hooks."
+            }
+        ),
+        # 1.2 指定文件名 (category/filename)
+        client.call_tool(
+            "create_knowledge",
+            {
+                "title": "FastAPI Guide",
+                "category": "backend", 
+                "tags": "python, api", 
+                "description": "FastAPI basics.",
+                "filename": "fastapi_guide.md"
+            }
+        ),
+        # 1.3 指定完整路径
+        client.call_tool(
+            "create_knowledge",
+            {
+                "title": "Project Config",
+                "category": "config", 
+                "tags": "settings", 
+                "description": "Global settings.",
+                "filename": "core/settings.md"
+            }
+        ),
     )
     print(f"1.1 自动生成: {res1}")
-    
-    # 1.2 指定文件名 (category/filename)
-    res2 = await client.call_tool(
-        "create_knowledge",
-        {
-            "title": "FastAPI Guide",
-            "category": "backend", 
-            "tags": "python, api", 
-            "description": "FastAPI basics.",
-            "filename": "fastapi_guide.md"
-        }
-    )
     print(f"1.2 指定文件名: {res2}")
-    
-    # 1.3 指定完整路径
-    res3 = await client.call_tool(
-        "create_knowledge",
-        {
-            "title": "Project Config",
-            "category": "config", 
-            "tags": "settings", 
-            "description": "Global settings.",
-            "filename": "core/settings.md"
-        }
-    )
     print(f"1.3 指定完整路径: {res3}")
 
-    # 1.4 测试重复创建 (应失败)
+    # 1.4 测试重复创建 (应失败，依赖 1.1 已完成)
     res4 = await client.call_tool(
         "create_knowledge",
         {
@@ -106,12 +105,15 @@ Side effects.
     print("3. 测试 get_file_outline (结构解析)")
     print("=" * 60)
     outline = {}
+    by_title = {}
     try:
         outline_json = await client.call_tool("get_file_outline", {"path": "libs/react_hooks.md"})
         outline = json.loads(outline_json)
         print("3.1 结构树:")
         for node in outline.get("structure", []):
             print(f"    {node['id']}: {node['title']} (L{node.get('level')})")
+            # 标题 -> 节点索引，同名标题以首个为准
+            by_title.setdefault(node["title"], node)
     except:
         print(f"解析失败: {outline_json}")
 
@@ -134,12 +136,7 @@ Side effects.
     
     # 我们尝试更新 useState (需先确认 ID，这里模拟盲猜，可能会失败，真实场景 Agent 会先读 Outline)
     # 为了自动化测试，我们解析刚才的 output
-    target_id = None
-    if isinstance(outline, dict):
-        for node in outline.get("structure", []):
-            if "useState" in node["title"]:
-                target_id = node["id"]
-                break
+    target_id = by_title.get("useState", {}).get("id")
     
     if target_id:
         print(f"4.1 尝试更新 ID {target_id} (useState)...")
@@ -183,6 +180,10 @@ Side effects.
 
 async def test_doc_mcp():
     """主测试入口"""
+    # 仅在脚本运行时导入 fastmcp，避免 pytest 收集阶段承担导入开销
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+
     print("=" * 80)
     print("Doc MCP V2 工具测试")
     print("=" * 80)
@@ -211,8 +212,9 @@ async def test_doc_mcp():
             
     except Exception as e:
         print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        # 仅在调试时打印完整堆栈
+        if os.getenv("SUB_AGENT_DEBUG"):
+            traceback.print_exc()
     finally:
         print(f"\n清理测试目录: {test_dir}")
         shutil.rmtree(test_dir, ignore_errors=True)
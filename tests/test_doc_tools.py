@@ -0,0 +1,193 @@
+"""
+doc_mcp 内部辅助函数单元测试
+测试目录遍历、路径解析与缓存失效
+"""
+
+import json
+import os
+import shutil
+import sys
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+
+# tools/ 不是包，直接加入 sys.path 导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+import doc_mcp
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    """以临时目录作为知识库根目录 (KNOWLEDGE_ROOT 为 CWD)，并清空进程级缓存"""
+    monkeypatch.chdir(tmp_path)
+    doc_mcp._META_CACHE.clear()
+    monkeypatch.setattr(doc_mcp, "_BASENAME_INDEX", {})
+    monkeypatch.setattr(doc_mcp, "_INDEX_DIR_MTIMES", {})
+    monkeypatch.setattr(doc_mcp, "_ENSURED_HISTORY_DIRS", set())
+    return tmp_path
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+class TestIterFiles:
+    """目录遍历测试"""
+
+    def test_catalog_lists_hidden_files_but_skips_hidden_dirs(self, kb):
+        """隐藏文件照常列出，隐藏目录 (含 .history) 不进入"""
+        _write(kb / "libs" / ".hidden.md", "---\ntitle: Hidden\n---\n# H\n")
+        _write(kb / ".drafts" / "draft.md", "# D\n")
+        _write(kb / ".history" / "libs_a.md" / "a.md", "# S\n")
+
+        paths = [item["path"] for item in json.loads(doc_mcp.list_knowledge_catalog())]
+        assert paths == ["libs/.hidden.md"]
+
+    def test_resolve_finds_files_in_hidden_dirs_except_history(self, kb):
+        """模糊解析只跳过 .history，其他隐藏目录中的文件可以找到"""
+        _write(kb / ".drafts" / "draft.md", "# D\n")
+        _write(kb / ".history" / "libs_a.md" / "snapped.md", "# S\n")
+
+        assert doc_mcp._smart_resolve_path("draft.md") == ".drafts/draft.md"
+        # 未找到时原样返回
+        assert doc_mcp._smart_resolve_path("snapped.md") == "snapped.md"
+
+
+class TestBasenameIndex:
+    """文件名索引测试"""
+
+    def test_new_file_in_subdir_invalidates_index(self, kb):
+        """子目录中新增文件 (该目录 mtime 变化) 后，索引重建并能解析到新文件"""
+        _write(kb / "libs" / "a.md", "# A\n")
+        sub = kb / "libs" / "sub"
+        sub.mkdir()
+        assert doc_mcp._smart_resolve_path("b.md") == "b.md"
+
+        st = sub.stat()
+        _write(sub / "b.md", "# B\n")
+        # 避免粗粒度时间戳的文件系统上 mtime 不变
+        os.utime(sub, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        assert doc_mcp._smart_resolve_path("b.md") == "libs/sub/b.md"
+        # 父目录 libs 的 mtime 未变，失效依赖于逐目录记录的 mtime
+        assert doc_mcp._INDEX_DIR_MTIMES[os.path.join(".", "libs")] == (kb / "libs").stat().st_mtime_ns
+
+
+class TestMetaCache:
+    """Frontmatter 元数据缓存测试"""
+
+    def test_catalog_picks_up_frontmatter_edit(self, kb):
+        """修改 Frontmatter 后 (mtime/size 变化)，目录列表返回新值而非缓存值"""
+        doc = kb / "libs" / "a.md"
+        _write(doc, "---\ntitle: Old\ncategory: libs\n---\n# A\n")
+        assert json.loads(doc_mcp.list_knowledge_catalog())[0]["title"] == "Old"
+
+        st = doc.stat()
+        _write(doc, "---\ntitle: New Title\ncategory: libs\n---\n# A\n")
+        # 避免粗粒度时间戳的文件系统上 mtime 不变
+        os.utime(doc, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        assert json.loads(doc_mcp.list_knowledge_catalog())[0]["title"] == "New Title"
+
+
+    def test_catalog_cache_holds_every_document(self, kb, monkeypatch):
+        """文档数超过 256 时第二次列目录仍全部命中缓存，已删除文件的条目被清除"""
+        for i in range(300):
+            _write(kb / "libs" / f"doc{i:03d}.md", f"---\ntitle: Doc {i}\n---\n# D\n")
+        first = doc_mcp.list_knowledge_catalog()
+
+        reads = []
+        real_read = doc_mcp._read_frontmatter_only
+        monkeypatch.setattr(doc_mcp, "_read_frontmatter_only", lambda path: reads.append(path) or real_read(path))
+        assert doc_mcp.list_knowledge_catalog() == first
+        assert reads == []
+
+        os.remove(kb / "libs" / "doc000.md")
+        assert len(json.loads(doc_mcp.list_knowledge_catalog())) == 299
+        assert str(kb / "libs" / "doc000.md") not in doc_mcp._META_CACHE
+        assert len(doc_mcp._META_CACHE) == 299
+
+class TestWriteBytes:
+    """文档写入测试"""
+
+    def test_append_keeps_existing_bytes(self, kb):
+        """APPEND 不改动原有内容的换行符，快照保持修改前的内容"""
+        doc = kb / "libs" / "a.md"
+        doc.parent.mkdir()
+        doc.write_bytes(b"# A\r\nline\r\n")
+
+        assert "成功" in doc_mcp.update_knowledge_section("libs/a.md", "APPEND", "APPEND", "more")
+
+        addition = ("\n\nmore").replace("\n", os.linesep).encode("utf-8")
+        assert doc.read_bytes() == b"# A\r\nline\r\n" + addition
+        (snap,) = (kb / ".history" / "libs_a.md").iterdir()
+        assert snap.read_bytes() == b"# A\r\nline\r\n"
+
+    @pytest.mark.skipif(os.name == "nt", reason="Windows 不支持 POSIX 权限位")
+    def test_write_keeps_file_mode(self, kb):
+        """替换写入后保留原文件的权限位"""
+        doc = kb / "a.md"
+        doc.write_text("# A\nline\n", encoding="utf-8")
+        doc.chmod(0o600)
+
+        doc_mcp.update_knowledge_section("a.md", "APPEND", "APPEND", "more")
+        assert doc.stat().st_mode & 0o777 == 0o600
+        doc_mcp.update_knowledge_section("a.md", "1", "A", "# B\nx")
+        assert doc.stat().st_mode & 0o777 == 0o600
+
+    def test_write_through_symlink(self, kb):
+        """符号链接形式的文档：写入其指向的文件，链接本身保留"""
+        target = kb / "a.md"
+        target.write_text("# A\nline\n", encoding="utf-8")
+        link = kb / "link.md"
+        try:
+            link.symlink_to("a.md")
+        except (OSError, NotImplementedError):
+            pytest.skip("当前平台无法创建符号链接")
+
+        doc_mcp.update_knowledge_section("link.md", "1", "A", "# B\nx")
+
+        assert link.is_symlink()
+        assert target.read_text(encoding="utf-8").splitlines() == ["# B", "x"]
+        (snap,) = (kb / ".history" / "link.md").iterdir()
+        assert snap.read_text(encoding="utf-8") == "# A\nline\n"
+
+
+class TestViewDocChanges:
+    """变更查看测试"""
+
+    @pytest.mark.skipif(shutil.which("git") is None, reason="未安装 git")
+    def test_large_file_diff_format(self, kb, monkeypatch):
+        """超过阈值的文档走 git diff：输出格式与 difflib 分支一致，且不受外部 diff 程序与颜色配置影响"""
+        monkeypatch.setenv("GIT_EXTERNAL_DIFF", "echo")
+        monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+        monkeypatch.setenv("GIT_CONFIG_KEY_0", "color.ui")
+        monkeypatch.setenv("GIT_CONFIG_VALUE_0", "always")
+
+        body = "\n".join(f"line {i}" for i in range(40000))
+        _write(kb / "big.md", f"# Big\n{body}\n# Tail\nold\n")
+        assert os.path.getsize(kb / "big.md") > doc_mcp._GIT_DIFF_THRESHOLD
+        doc_mcp.update_knowledge_section("big.md", "2", "Tail", "# Tail\nnew")
+
+        diff = doc_mcp.view_doc_changes("big.md")
+        assert "\x1b[" not in diff
+        # 与 difflib 分支使用相同的文件标签，不暴露服务器上的路径
+        (snap,) = (kb / ".history" / "big.md").iterdir()
+        assert diff.startswith(f"--- 快照 ({snap.name})\n+++ 当前版本\n@@ ")
+        assert "diff --git" not in diff
+        assert str(kb) not in diff and os.path.realpath(kb) not in diff
+        assert "\n-old\n" in diff
+        assert "\n+new" in diff
+
+    def test_history_dir_deleted_externally(self, kb):
+        """.history 被外部删除后，查看变更与再次快照都会重建目录"""
+        _write(kb / "a.md", "# A\nold\n")
+        doc_mcp.update_knowledge_section("a.md", "1", "A", "# A\nnew")
+        shutil.rmtree(kb / ".history")
+
+        assert doc_mcp.view_doc_changes("a.md") == "未找到历史快照 (初始版本)。"
+
+        shutil.rmtree(kb / ".history")
+        assert "成功" in doc_mcp.update_knowledge_section("a.md", "1", "A", "# A\nnewer")
+        assert "+newer" in doc_mcp.view_doc_changes("a.md")
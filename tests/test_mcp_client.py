@@ -8,11 +8,9 @@ import asyncio
 import json
 import os
 import sys
+import traceback
 from pathlib import Path
 
-# FastMCP Client 支持 HTTP 连接
-from fastmcp import Client
-
 
 def load_mcp_config(config_path: str = "../mcp_config.json", server_name: str = "sub-agents") -> dict:
     """从 MCP JSON 配置文件加载 Server 参数"""
@@ -31,6 +29,11 @@ def load_mcp_config(config_path: str = "../mcp_config.json", server_name: str =
 
 
 async def test_mcp_server(config_path: str = "mcp_config.json"):
+    # 仅在脚本运行时导入 fastmcp，避免 pytest 收集阶段承担导入开销
+    # FastMCP Client 支持 HTTP 连接
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+
     print("=" * 80)
     print("MCP Server 测试")
     print("=" * 80)
@@ -80,7 +83,6 @@ async def test_mcp_server(config_path: str = "mcp_config.json"):
             env.setdefault("PYTHONIOENCODING", "utf-8")
             
             # 使用 FastMCP Client 的 STDIO 模式
-            from fastmcp.client.transports import StdioTransport
             transport = StdioTransport(
                 command=server_config["command"],
                 args=server_config.get("args", []),
@@ -91,8 +93,9 @@ async def test_mcp_server(config_path: str = "mcp_config.json"):
                 
     except Exception as e:
         print(f"\n❌ 连接失败: {e}")
-        import traceback
-        traceback.print_exc()
+        # 仅在调试时打印完整堆栈
+        if os.getenv("SUB_AGENT_DEBUG"):
+            traceback.print_exc()
 
 
 async def run_tests(client):
@@ -127,8 +130,9 @@ async def run_tests(client):
         
     except Exception as e:
         print(f"\n❌ 调用失败: {e}")
-        import traceback
-        traceback.print_exc()
+        # 仅在调试时打印完整堆栈
+        if os.getenv("SUB_AGENT_DEBUG"):
+            traceback.print_exc()
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@
 直接测试 model_resolver.py 的解析逻辑，不依赖 MCP
 """
 
-from src.model_resolver import resolve_model
+from src.model_resolver import resolve_model, build_alias_table, MODEL_ALIASES
 
 # 模拟 agents.yaml 中的 model_registry
 MOCK_REGISTRY = {
@@ -62,6 +62,15 @@ def test_resolve_model():
     return failed == 0
 
 
+def test_build_alias_table():
+    """预解析别名表应与 resolve_model 逐个解析的结果一致"""
+    for use_preview in (True, False):
+        table = build_alias_table(MOCK_REGISTRY, use_preview)
+        assert set(table) == set(MODEL_ALIASES)
+        for alias in MODEL_ALIASES:
+            assert table[alias] == resolve_model(alias, MOCK_REGISTRY, use_preview)
+
+
 if __name__ == "__main__":
     success = test_resolve_model()
     exit(0 if success else 1)
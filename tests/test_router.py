@@ -5,19 +5,16 @@ AgentRouter 单元测试
 
 import os
 import pytest
-import tempfile
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 from src.router import AgentRouter
-from src.config import AgentConfig
+from src.launcher import GeminiLauncher, GeminiLauncherError
 
 
-class TestAgentRouter:
-    """AgentRouter 单元测试"""
-    
-    @pytest.fixture
-    def sample_config(self, tmp_path):
-        """创建临时配置文件"""
-        config_content = """
+@pytest.fixture(scope="module")
+def sample_config(tmp_path_factory):
+    """创建临时配置文件 (整个模块共享，用例不得修改)"""
+    tmp_path = tmp_path_factory.mktemp("router_cfg")
+    config_content = """
 global:
   model_registry:
     preview:
@@ -50,41 +47,130 @@ agents:
     model: "flash"
     system_prompt: "prompts/reviewer.md"
 """
+    config_file = tmp_path / "agents.yaml"
+    config_file.write_text(config_content, encoding='utf-8')
+    
+    # 创建 prompts 目录和文件
+    prompts_dir = tmp_path / "prompts"
+    prompts_dir.mkdir()
+    (prompts_dir / "reviewer.md").write_text("You are a code reviewer.", encoding='utf-8')
+    
+    return str(config_file)
+
+
+@pytest.fixture(scope="module")
+def shared_router(sample_config):
+    """整个模块共享的 Router (相对路径的 system_prompt 以配置所在目录为基准，无需切换 CWD)"""
+    return AgentRouter(sample_config, base_dir=os.path.dirname(sample_config))
+
+
+@pytest.fixture
+def router(shared_router):
+    """复用共享 Router，但清空 launcher 复用池，避免拿到上一个用例 patch 出的 mock"""
+    shared_router._launcher_pool.clear()
+    return shared_router
+
+
+@pytest.fixture(scope="module")
+def launcher_spec():
+    """GeminiLauncher 的属性名列表，只内省一次；以名称列表作 spec 创建 mock 无需再逐个检查类属性"""
+    return dir(GeminiLauncher)
+
+
+@pytest.fixture
+def mock_launcher(launcher_spec, monkeypatch):
+    """替换 Router 使用的 GeminiLauncher，所有 launcher 都返回同一个 mock"""
+    launcher = MagicMock(spec=launcher_spec)
+    launcher.run.return_value = "Mock response"
+    monkeypatch.setattr("src.router.GeminiLauncher", lambda *args, **kwargs: launcher)
+    return launcher
+
+
+@pytest.fixture
+def request_config(tmp_path):
+    """请求级配置：Router 要求显式指定工作目录"""
+    return {"cwd": str(tmp_path)}
+
+
+class TestAgentRouter:
+    """AgentRouter 单元测试"""
+    
+    def test_router_init(self, router):
+        """测试 Router 初始化"""
+        assert router.config_loader is not None
+    
+    def test_router_reuses_and_reloads_config(self, sample_config, tmp_path):
+        """测试重复创建 Router 复用已解析的配置，配置文件变化后重新加载"""
+        # 共享配置不可修改，复制一份到本用例的临时目录
+        with open(sample_config, 'r', encoding='utf-8') as f:
+            content = f.read()
         config_file = tmp_path / "agents.yaml"
-        config_file.write_text(config_content, encoding='utf-8')
+        config_file.write_text(content, encoding='utf-8')
+        
+        router = AgentRouter(str(config_file))
+        assert AgentRouter(str(config_file)).config_loader is router.config_loader
         
-        # 创建 prompts 目录和文件
-        prompts_dir = tmp_path / "prompts"
-        prompts_dir.mkdir()
-        (prompts_dir / "reviewer.md").write_text("You are a code reviewer.", encoding='utf-8')
+        config_file.write_text(content.replace('"代码审查专家"', '"代码审查专家 v2"'), encoding='utf-8')
         
-        # 切换工作目录到临时目录（因为 system_prompt 是相对路径）
-        original_cwd = os.getcwd()
-        os.chdir(tmp_path)
-        yield str(config_file)
-        os.chdir(original_cwd)
+        reloaded = AgentRouter(str(config_file))
+        assert reloaded.config_loader.get_agent_config("reviewer").description == "代码审查专家 v2"
     
-    def test_router_init(self, sample_config):
-        """测试 Router 初始化"""
-        router = AgentRouter(sample_config)
-        assert router.config_loader is not None
+    def test_broken_agent_does_not_block_startup(self, tmp_path, mock_launcher, request_config):
+        """测试某个 Agent 的权限集格式错误时 Router 仍能启动并服务其他 Agent"""
+        config_file = tmp_path / "agents.yaml"
+        config_file.write_text("""
+global:
+  model_registry: {}
+permission_sets:
+  file_read:
+  web_access:
+    tools: [web_fetch]
+agents:
+  - name: broken
+    permission_set: file_read
+  - name: good
+    permission_set: web_access
+""", encoding='utf-8')
+
+        router = AgentRouter(str(config_file))
+        assert router.route_request("good", "test", request_config=request_config) == "Mock response"
+        result = router.route_request("broken", "test", request_config=request_config)
+        assert "未定义" in result and "file_read" in result
+    
+    def test_pooled_launcher_sees_env_changes(self, router, tmp_path, monkeypatch):
+        """测试复用池中的 launcher 不固化创建时的进程环境"""
+        launcher = router._get_launcher(str(tmp_path), {}, os.environ)
+        assert router._get_launcher(str(tmp_path), {}, os.environ) is launcher
+
+        monkeypatch.setenv("GEMINI_EXECUTABLE", "/opt/gemini-later")
+        assert launcher._gemini_executable == "/opt/gemini-later"
+    
+    def test_cwd_deleted_between_requests(self, router, mock_launcher, tmp_path):
+        """测试已确认的工作目录被外部删除后，下一次请求会重建目录而非失败"""
+        work_dir = tmp_path / "work"
+
+        def fake_run(**kwargs):
+            # 与真实 launcher 一致：工作目录不存在时 Popen 失败，报告为 not found
+            if not work_dir.is_dir():
+                raise GeminiLauncherError("Executable 'gemini' not found.")
+            return "Mock response"
+
+        mock_launcher.run.side_effect = fake_run
+        request_config = {"cwd": str(work_dir)}
+
+        assert router.route_request("reviewer", "test", request_config=request_config) == "Mock response"
+        work_dir.rmdir()
+        assert router.route_request("reviewer", "test", request_config=request_config) == "Mock response"
+        assert work_dir.is_dir()
     
-    def test_route_request_agent_not_found(self, sample_config):
+    def test_route_request_agent_not_found(self, router):
         """测试请求不存在的 Agent"""
-        router = AgentRouter(sample_config)
         result = router.route_request("nonexistent", "test instruction")
         assert "未定义" in result or "not found" in result.lower()
     
-    @patch('src.router.GeminiLauncher')
-    def test_route_request_success(self, mock_launcher_class, sample_config):
+    def test_route_request_success(self, router, mock_launcher, request_config, sample_config):
         """测试请求成功路由"""
-        # 模拟 Launcher
-        mock_launcher = MagicMock()
-        mock_launcher.run.return_value = "Mock response"
-        mock_launcher_class.return_value = mock_launcher
-        
-        router = AgentRouter(sample_config)
-        result = router.route_request("reviewer", "请分析代码")
+        result = router.route_request("reviewer", "请分析代码", request_config=request_config)
         
         assert result == "Mock response"
         mock_launcher.run.assert_called_once()
@@ -93,31 +179,21 @@ agents:
         call_kwargs = mock_launcher.run.call_args.kwargs
         assert call_kwargs["prompt"] == "请分析代码"
         assert call_kwargs["model"] == "gemini-3-flash-preview"  # flash 被解析
+        # 相对路径的 system_prompt 基于 base_dir 解析
+        assert call_kwargs["system_prompt"] == os.path.join(os.path.dirname(sample_config), "prompts", "reviewer.md")
     
-    @patch('src.router.GeminiLauncher')
-    def test_model_override(self, mock_launcher_class, sample_config):
+    def test_model_override(self, router, mock_launcher, request_config):
         """测试调用方覆盖模型"""
-        mock_launcher = MagicMock()
-        mock_launcher.run.return_value = "Mock response"
-        mock_launcher_class.return_value = mock_launcher
-        
-        router = AgentRouter(sample_config)
         # 调用方指定 model="pro"
-        result = router.route_request("reviewer", "test", model="pro")
+        result = router.route_request("reviewer", "test", request_config=request_config, model="pro")
         
         call_kwargs = mock_launcher.run.call_args.kwargs
         # 调用方的 "pro" 应该被解析为 gemini-3-pro-preview (因为 use_preview=true)
         assert call_kwargs["model"] == "gemini-3-pro-preview"
     
-    @patch('src.router.GeminiLauncher')
-    def test_tools_passed_correctly(self, mock_launcher_class, sample_config):
+    def test_tools_passed_correctly(self, router, mock_launcher, request_config):
         """测试工具列表正确传递"""
-        mock_launcher = MagicMock()
-        mock_launcher.run.return_value = "Mock response"
-        mock_launcher_class.return_value = mock_launcher
-        
-        router = AgentRouter(sample_config)
-        router.route_request("reviewer", "test")
+        router.route_request("reviewer", "test", request_config=request_config)
         
         call_kwargs = mock_launcher.run.call_args.kwargs
         tools = call_kwargs["tools"]
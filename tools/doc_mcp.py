@@ -10,14 +10,26 @@ Author: Antigravity Agent
 """
 import os
 import shutil
+import stat
+import subprocess
+import tempfile
 import difflib
 import yaml
 import json
 import re
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple, Any
 from datetime import datetime
 from mcp.server.fastmcp import FastMCP
 
+# 优先使用 libyaml 加速的 C 解析器/生成器，未编译 libyaml 时回退到纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
 # 初始化 FastMCP 服务器
 mcp = FastMCP("DocKeeperTools")
 
@@ -26,6 +38,25 @@ mcp = FastMCP("DocKeeperTools")
 KNOWLEDGE_ROOT = "."
 HISTORY_DIR = os.path.join(KNOWLEDGE_ROOT, ".history")
 
+# Frontmatter 解析缓存: 绝对路径 -> ((mtime_ns, size), meta)
+# 不设上限 (目录列表每次按顺序访问全部文件，定长 LRU 在文件数超过容量时会全部失效)，
+# 由 list_knowledge_catalog 在遍历后清除已不存在的路径
+_META_CACHE: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+_META_LOCK = threading.Lock()
+
+# _smart_resolve_path 使用的文件名索引，及构建时各目录的 mtime (用于判断索引是否过期)
+_BASENAME_INDEX: Dict[str, List[str]] = {}
+_INDEX_DIR_MTIMES: Dict[str, Optional[int]] = {}
+
+# 本进程内已确认存在的历史快照目录 (绝对路径)
+_ENSURED_HISTORY_DIRS: set = set()
+
+# 任一侧超过该大小时 view_doc_changes 改用 git diff (C 实现) 计算差异，避免 difflib 的高内存占用
+_GIT_DIFF_THRESHOLD = 256 * 1024
+
+# Markdown 标题行。允许行首空白并要求标题含非空白字符，效果等同于先 strip() 再匹配，但无需逐行构造新字符串
+_HEADING_RE = re.compile(r'^\s*(#{1,6})\s+(\S.*)$')
+
 # --- 内部辅助函数 ---
 
 def _validate_path(path: str) -> str:
@@ -45,23 +76,81 @@ def _validate_path(path: str) -> str:
     
     return abs_target
 
-def _ensure_history_dir(file_path: str):
-    """确保指定文件的 .history 目录存在。"""
+def _ensure_history_dir(file_path: str, recheck: bool = False):
+    """
+    确保指定文件的 .history 目录存在。已确认存在的目录记录在 _ENSURED_HISTORY_DIRS 中，不再重复 makedirs。
+    recheck=True 用于目录在进程运行期间被外部删除 (如 git clean) 后，忽略记录重新创建。
+    """
     safe_name = file_path.replace("/", "_").replace("\\", "_")
     target_dir = os.path.join(HISTORY_DIR, safe_name)
-    os.makedirs(target_dir, exist_ok=True)
+    # HISTORY_DIR 是相对路径，以绝对路径为键，避免 CWD 变化后误判
+    key = os.path.abspath(target_dir)
+    if recheck or key not in _ENSURED_HISTORY_DIRS:
+        os.makedirs(target_dir, exist_ok=True)
+        _ENSURED_HISTORY_DIRS.add(key)
     return target_dir
 
+def _save_snapshot(abs_path: str, snap_path: str):
+    """将 abs_path 的当前内容保存为 snap_path。"""
+    # 优先以硬链接保存快照 (不复制内容)；写入方总是先写临时文件再替换，
+    # 原 inode 不会被修改，快照始终保持修改前的内容
+    tmp_snap = snap_path + ".tmp"
+    try:
+        # 链接符号链接指向的文件，而非链接本身
+        os.link(os.path.realpath(abs_path), tmp_snap)
+    except OSError:
+        # 跨设备、文件系统不支持或权限不足时回退为复制
+        shutil.copy2(abs_path, snap_path)
+    else:
+        os.replace(tmp_snap, snap_path)
+
 def _create_snapshot(file_path: str, abs_path: str):
     """创建文件快照。"""
     if os.path.exists(abs_path):
         history_dir = _ensure_history_dir(file_path)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         snap_path = os.path.join(history_dir, f"{timestamp}.snap")
-        shutil.copy2(abs_path, snap_path)
+        try:
+            _save_snapshot(abs_path, snap_path)
+        except FileNotFoundError:
+            if not os.path.exists(abs_path):
+                raise
+            # 历史目录已被外部删除：重建后重试一次
+            _ensure_history_dir(file_path, recheck=True)
+            _save_snapshot(abs_path, snap_path)
         return snap_path
     return None
 
+def _write_bytes(abs_path: str, data: bytes):
+    """
+    绕过文本层写入字节内容：先写入同目录临时文件，再原子替换目标文件。
+    不在原 inode 上修改，硬链接快照不受影响，中途失败也不会留下写了一半的文档。
+    目标为符号链接时替换其指向的文件 (链接本身保留)，并沿用原文件的权限位。
+    """
+    real_path = os.path.realpath(abs_path)
+    # 临时文件名唯一，同一进程内的并发写入互不冲突
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(real_path),
+                                    prefix=os.path.basename(real_path) + ".", suffix=".tmp")
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            os.close(fd)
+        try:
+            mode = stat.S_IMODE(os.stat(real_path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        # mkstemp 创建的文件权限为 0600，替换前恢复为原文件的权限
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, real_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def _parse_frontmatter(content: str) -> Tuple[Dict, str]:
     """解析 Frontmatter，返回 (meta, body)。"""
     if content.startswith("---"):
@@ -70,19 +159,171 @@ def _parse_frontmatter(content: str) -> Tuple[Dict, str]:
             if len(parts) >= 3:
                 yaml_content = parts[1]
                 body = parts[2]
-                meta = yaml.safe_load(yaml_content) or {}
+                meta = yaml.load(yaml_content, Loader=_YamlLoader) or {}
                 return meta, body
         except Exception:
             pass
     return {}, content
 
+def _is_hidden_dir(name: str) -> bool:
+    """隐藏目录 (以 '.' 开头，含 .history)。"""
+    return name.startswith('.')
+
+def _is_history_dir(name: str) -> bool:
+    """快照目录 .history。"""
+    return ".history" in name
+
+def _iter_files(root: str, on_dir=None, skip_dir=_is_hidden_dir):
+    """
+    用 os.scandir 深度优先遍历 root 下的文件 (顺序与 os.walk 一致)。DirEntry 自带类型信息，
+    判断文件/目录无需额外 stat。只按 skip_dir(目录名) 剪枝目录，文件不论名称一律产出；
+    与 os.walk 一样不进入指向目录的符号链接。
+    产出 (path, name, DirEntry)；on_dir 若提供，会在扫描每个目录之前以目录路径调用。
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        if on_dir is not None:
+            on_dir(current)
+        subdirs = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if not entry.is_symlink() and not skip_dir(entry.name):
+                            subdirs.append(entry.path)
+                    else:
+                        yield entry.path, entry.name, entry
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
+
+def _dir_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _ensure_basename_index() -> Dict[str, List[str]]:
+    """
+    返回 文件名 -> [相对路径] 索引。索引记录构建时每个目录的 mtime，
+    任一目录增删过条目 (mtime 变化) 就整体重建；否则只需逐目录 stat，无需重新遍历文件。
+    """
+    global _BASENAME_INDEX, _INDEX_DIR_MTIMES
+    if _INDEX_DIR_MTIMES and all(_dir_mtime(d) == m for d, m in _INDEX_DIR_MTIMES.items()):
+        return _BASENAME_INDEX
+
+    index: Dict[str, List[str]] = {}
+    dir_mtimes: Dict[str, Optional[int]] = {}
+
+    def record_dir(d: str):
+        # 扫描目录之前记录 mtime，扫描期间发生的变更会在下次调用时触发重建
+        dir_mtimes[d] = _dir_mtime(d)
+
+    # 与原 os.walk 实现一致：只跳过 .history，其他隐藏目录中的文件同样可被找到
+    for file_path, name, _ in _iter_files(KNOWLEDGE_ROOT, on_dir=record_dir, skip_dir=_is_history_dir):
+        index.setdefault(name, []).append(os.path.relpath(file_path, KNOWLEDGE_ROOT).replace("\\", "/"))
+
+    _BASENAME_INDEX, _INDEX_DIR_MTIMES = index, dir_mtimes
+    return index
+
+def _iter_md_files(root: str):
+    """遍历 root 下的 Markdown 文件，产出 (path, name, stat)，stat 供元数据缓存复用。"""
+    for path, name, entry in _iter_files(root):
+        if name.endswith('.md'):
+            try:
+                yield path, name, entry.stat()
+            except OSError:
+                continue
+
+def _read_frontmatter_only(path: str, max_lines: int = 200) -> str:
+    """
+    只读取文件开头的 Frontmatter 块 (含首尾 '---' 行)，读到结束分隔符即停止，不读取正文。
+    文件不以 '---' 开头时返回空字符串。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+        if not first.startswith("---"):
+            return ""
+        lines = [first]
+        for line in f:
+            lines.append(line)
+            if line.startswith("---") or len(lines) >= max_lines:
+                break
+    return "".join(lines)
+
+def _cached_meta(key: str, stamp: Tuple[int, int]) -> Optional[Dict]:
+    """查询元数据缓存，(mtime, size) 不一致视为未命中。"""
+    with _META_LOCK:
+        cached = _META_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    return None
+
+def _load_meta(path: str, st: Optional[os.stat_result] = None) -> Dict:
+    """
+    读取文件的 Frontmatter 元数据，按 (mtime, size) 校验缓存，未变化的文件不再打开解析。
+    st 为调用方已获取的 stat 结果，可省去一次 stat。返回的 dict 由缓存共享，调用方不得修改。
+    可在多个线程中并发调用，读取与解析在锁外进行。
+    """
+    if st is None:
+        st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = os.path.abspath(path)
+
+    cached = _cached_meta(key, stamp)
+    if cached is not None:
+        return cached
+
+    meta = {}
+    try:
+        meta, _ = _parse_frontmatter(_read_frontmatter_only(path))
+    except Exception:
+        pass
+
+    with _META_LOCK:
+        _META_CACHE[key] = (stamp, meta)
+    return meta
+
+def _prune_meta_cache(live_keys: set):
+    """清除已删除或移动的文件的缓存条目。"""
+    with _META_LOCK:
+        for key in [k for k in _META_CACHE if k not in live_keys]:
+            del _META_CACHE[key]
+
+def _load_catalog_metas(entries: List[Tuple[str, str, os.stat_result]]) -> List[Dict]:
+    """
+    批量读取元数据。缓存命中的直接返回；未命中的文件多于一个时交给线程池并发读取，
+    让多个文件的磁盘读取相互重叠。entries 须为一次完整遍历的结果，不在其中的缓存条目会被清除。
+    """
+    keys = [os.path.abspath(path) for path, _, _ in entries]
+    _prune_meta_cache(set(keys))
+    metas: List[Optional[Dict]] = [
+        _cached_meta(key, (st.st_mtime_ns, st.st_size)) for key, (_, _, st) in zip(keys, entries)
+    ]
+    misses = [i for i, meta in enumerate(metas) if meta is None]
+    if len(misses) > 1:
+        workers = min(32, len(misses), (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            loaded = executor.map(lambda i: _load_meta(entries[i][0], entries[i][2]), misses)
+            for i, meta in zip(misses, loaded):
+                metas[i] = meta
+    else:
+        for i in misses:
+            metas[i] = _load_meta(entries[i][0], entries[i][2])
+    return metas
+
 def _build_frontmatter(meta: Dict) -> str:
     """构建 Frontmatter 字符串。"""
     # 确保 last_updated 存在
     if "last_updated" not in meta:
         meta["last_updated"] = datetime.now().strftime("%Y-%m-%d")
     
-    yaml_str = yaml.dump(meta, allow_unicode=True, sort_keys=False).strip()
+    yaml_str = yaml.dump(meta, Dumper=_YamlDumper, allow_unicode=True, sort_keys=False).strip()
     return f"---\n{yaml_str}\n---\n"
 
 def _smart_resolve_path(path_query: str) -> str:
@@ -101,19 +342,8 @@ def _smart_resolve_path(path_query: str) -> str:
         
     # 2. 模糊查找 (只匹配文件名)
     target_name = os.path.basename(path_query)
-    candidates = []
-    
-    for root, _, files in os.walk(KNOWLEDGE_ROOT):
-        # 跳过 .history
-        if ".history" in root:
-            continue
-            
-        if target_name in files:
-            rel_dir = os.path.relpath(root, KNOWLEDGE_ROOT)
-            if rel_dir == ".":
-                candidates.append(target_name)
-            else:
-                candidates.append(os.path.join(rel_dir, target_name).replace("\\", "/"))
+    # 索引遍历时已跳过 .history 目录
+    candidates = _ensure_basename_index().get(target_name, [])
     
     if len(candidates) == 1:
         return candidates[0]
@@ -129,32 +359,43 @@ def _smart_resolve_path(path_query: str) -> str:
     # 这里我们返回原值，交给调用者判断是否存在
     return path_query
 
-def _get_outline_tree(content: str) -> List[Dict]:
+def _parse_outline_with_ranges(lines: List[str]) -> Tuple[List[Dict], Dict[str, Tuple[int, int]]]:
     """
-    解析 Markdown 标题树。
-    返回: [{"id": "1", "title": "Overview", "level": 1, "children": []}, ...]
-    这里为了简单，返回扁平列表，但包含 level 信息供逻辑处理。
+    单次遍历解析 Markdown 标题树，同时计算每个章节的行范围。
+    返回 (outline, ranges):
+    - outline: 扁平列表 [{"id": "1", "title": "Overview", "level": 1, "line_start": 1}, ...]
+    - ranges: {node_id: (start, end)}，0-based 半开区间，从标题行到下一个同级或更高级标题之前
     """
-    lines = content.splitlines()
     outline = []
+    ranges: Dict[str, Tuple[int, int]] = {}
     counters = [0] * 7 # H1-H6 计数器
+    id_parts: List[str] = []  # 当前标题 ID 的各级编号
+    open_nodes: List[Tuple[int, str, int]] = []  # 尚未结束的章节 (level, id, start)
     
     for i, line in enumerate(lines):
-        match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
+        match = _HEADING_RE.match(line)
         if match:
             level = len(match.group(1))
             title = match.group(2).strip()
             
+            # 同级或更高级的标题结束之前打开的章节
+            while open_nodes and open_nodes[-1][0] >= level:
+                _, closed_id, closed_start = open_nodes.pop()
+                ranges[closed_id] = (closed_start, i)
+            
             # 更新计数器
             counters[level] += 1
             # 重置子级计数器
             for j in range(level + 1, 7):
                 counters[j] = 0
                 
-            # 生成 ID (如 1.2.1)
-            # 只取有效层级
-            current_id_parts = [str(c) for c in counters[1:level+1]]
-            node_id = ".".join(current_id_parts)
+            # 生成 ID (如 1.2.1)：id_parts 始终等于 counters[1:当前层级+1] 的字符串形式，
+            # 只截断到上一级并补齐被跳过的层级 (计数为 0)，再追加本级
+            del id_parts[level - 1:]
+            while len(id_parts) < level - 1:
+                id_parts.append(str(counters[len(id_parts) + 1]))
+            id_parts.append(str(counters[level]))
+            node_id = ".".join(id_parts)
             
             outline.append({
                 "id": node_id,
@@ -162,7 +403,20 @@ def _get_outline_tree(content: str) -> List[Dict]:
                 "level": level,
                 "line_start": i + 1 # 1-based line number for internal ref (not exposed)
             })
+            open_nodes.append((level, node_id, i))
+    
+    # 文末仍未结束的章节延伸到最后一行
+    for _, closed_id, closed_start in open_nodes:
+        ranges[closed_id] = (closed_start, len(lines))
             
+    return outline, ranges
+
+def _get_outline_tree(content: str) -> List[Dict]:
+    """
+    解析 Markdown 标题树。
+    这里为了简单，返回扁平列表，但包含 level 信息供逻辑处理。
+    """
+    outline, _ = _parse_outline_with_ranges(content.splitlines())
     return outline
 
 # --- MCP Tools ---
@@ -178,43 +432,30 @@ def list_knowledge_catalog(category: Optional[str] = None, detail: bool = False)
     """
     catalog = []
     
-    for root, dirs, files in os.walk(KNOWLEDGE_ROOT):
-        # 过滤隐藏目录
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
+    # 遍历时已跳过隐藏目录 (含 .history)，隐藏文件仍会列出
+    entries = list(_iter_md_files(KNOWLEDGE_ROOT))
+    # 读取元数据 (带缓存，复用遍历时的 stat，未命中的文件并发读取)
+    metas = _load_catalog_metas(entries)
+    
+    for (rel_path, file, _), meta in zip(entries, metas):
+        display_path = os.path.relpath(rel_path, KNOWLEDGE_ROOT).replace("\\", "/")
         
-        for file in files:
-            if not file.endswith('.md'):
-                continue
-                
-            rel_path = os.path.join(root, file)
-            display_path = os.path.relpath(rel_path, KNOWLEDGE_ROOT).replace("\\", "/")
-            
-            # 读取元数据
-            meta = {}
-            try:
-                with open(rel_path, 'r', encoding='utf-8') as f:
-                    # 安全读取前 50 行
-                    lines = f.readlines()[:50]
-                    meta, _ = _parse_frontmatter("".join(lines))
-            except Exception:
-                pass
+        # 过滤
+        file_cat = meta.get('category', 'unknown')
+        if category and category.lower() not in file_cat.lower():
+            continue
             
-            # 过滤
-            file_cat = meta.get('category', 'unknown')
-            if category and category.lower() not in file_cat.lower():
-                continue
-                
-            item = {
-                "path": display_path,
-                "title": meta.get('title', file),
-                "category": file_cat
-            }
+        item = {
+            "path": display_path,
+            "title": meta.get('title', file),
+            "category": file_cat
+        }
+        
+        if detail:
+            item['description'] = meta.get('description', 'No description.')
+            item['tags'] = meta.get('tags', [])
             
-            if detail:
-                item['description'] = meta.get('description', 'No description.')
-                item['tags'] = meta.get('tags', [])
-                
-            catalog.append(item)
+        catalog.append(item)
             
     return json.dumps(catalog, indent=2, ensure_ascii=False)
 
@@ -346,82 +587,83 @@ def update_knowledge_section(path: str, node_id: str, expected_title: str, new_c
         # 1. 创建快照
         _create_snapshot(resolved_path, abs_path)
         
-        # 2. 读取并解析
-        with open(abs_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        # 3. 处理 APPEND 模式
+        # 2. 处理 APPEND 模式
         if node_id == "APPEND":
-            with open(abs_path, 'a', encoding='utf-8') as f:
-                f.write("\n\n" + new_content)
+            # 不以追加模式原地修改 (会连带修改硬链接快照)，原字节内容加上新内容后整体替换；
+            # 原有部分按字节原样保留 (不改动其换行符)，新内容与文本模式追加一样使用平台换行符
+            with open(abs_path, 'rb') as f:
+                orig_bytes = f.read()
+            addition = ("\n\n" + new_content).replace("\n", os.linesep).encode("utf-8")
+            _write_bytes(abs_path, orig_bytes + addition)
             return "成功追加内容到文档末尾。"
 
-        # 4. 解析结构进行定位
-        # 这里我们需要更精细的行号定位，所以不仅要有 ID，还要有行范围
+        # 3. 读取并解析
+        with open(abs_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        # 4. 解析结构进行定位 (单次遍历同时得到 ID 与行范围)
         lines = content.splitlines()
-        update_start = -1
-        update_end = -1
-        
-        # 简易的大纲解析器 (复用逻辑但需要行号)
-        counters = [0] * 7
-        target_found = False
-        current_level = 0
+        _, ranges = _parse_outline_with_ranges(lines)
         
-        for i, line in enumerate(lines):
-            match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            if match:
-                level = len(match.group(1))
-                title = match.group(2).strip()
-                
-                # 如果已经找到了目标，且当前标题级别 <= 目标级别，说明目标块结束了
-                if target_found:
-                    if level <= current_level:
-                        update_end = i
-                        break
-                
-                # 更新计数器
-                counters[level] += 1
-                for j in range(level + 1, 7): counters[j] = 0
-                
-                # 生成 ID
-                current_id = ".".join([str(c) for c in counters[1:level+1]])
-                
-                # 检查匹配
-                if current_id == node_id:
-                    # 双重锁验证 (忽略大小写和空格)
-                    if expected_title.lower().strip() not in title.lower().strip():
-                        return f"双重锁验证失败: ID {node_id} 处的标题是 '{title}'，与期望的 '{expected_title}' 不符。请重新检查大纲。"
-                    
-                    target_found = True
-                    current_level = level
-                    update_start = i
-        
-        if not target_found:
+        if node_id not in ranges:
             return f"未找到 ID 为 {node_id} 的章节。"
-            
-        if update_end == -1: # 目标是最后一个章节
-            update_end = len(lines)
+        update_start, update_end = ranges[node_id]
+        
+        # 双重锁验证 (忽略大小写和空格)
+        title = _HEADING_RE.match(lines[update_start]).group(2).strip()
+        if expected_title.lower().strip() not in title.lower():
+            return f"双重锁验证失败: ID {node_id} 处的标题是 '{title}'，与期望的 '{expected_title}' 不符。请重新检查大纲。"
             
         # 5. 执行替换
         # 保留 update_start 之前的，替换 update_start 到 update_end，保留 update_end 之后的
         new_lines = new_content.splitlines()
         final_lines = lines[:update_start] + new_lines + lines[update_end:]
         
-        final_content = "\n".join(final_lines)
-        if content.endswith("\n") and not final_content.endswith("\n"):
-            final_content += "\n"
+        # 直接以平台换行符拼接 (与文本模式写入的结果一致)，编码一次后按字节写入
+        final_content = os.linesep.join(final_lines)
+        if content.endswith("\n") and not final_content.endswith(os.linesep):
+            final_content += os.linesep
             
-        with open(abs_path, 'w', encoding='utf-8') as f:
-            f.write(final_content)
+        _write_bytes(abs_path, final_content.encode("utf-8"))
             
         return f"成功更新章节 {node_id} ({expected_title})。\n影响行数: {update_end - update_start} -> {len(new_lines)}"
         
     except ValueError as e:
         return f"路径错误: {str(e)}"
+    except OSError as e:
+        # 文件不存在、权限不足等常见 I/O 错误，信息本身已足够定位，无需附带堆栈
+        return f"更新失败: {str(e)}"
     except Exception as e:
-        import traceback
         return f"更新失败: {str(e)}\n{traceback.format_exc()}"
 
+def _git_diff_files(old_path: str, new_path: str, fromfile: str, tofile: str) -> Optional[str]:
+    """
+    使用 git diff --no-index 比较两个文件，输出以 fromfile / tofile 作为文件标签。
+    git 不可用、执行失败或输出中没有文本差异块时返回 None。
+    """
+    git = shutil.which("git")
+    if not git:
+        return None
+    try:
+        result = subprocess.run(
+            # 不受用户 git 配置影响：禁用外部 diff 程序、颜色与 textconv，路径中的非 ASCII 字符不转义
+            [git, "-c", "core.quotepath=off", "--no-pager", "diff", "--no-index",
+             "--no-ext-diff", "--no-color", "--no-textconv", "--unified=3", old_path, new_path],
+            capture_output=True, text=True, encoding="utf-8", errors="replace"
+        )
+    except OSError:
+        return None
+    # --no-index 模式下: 0 = 无差异, 1 = 有差异, 其他 = 出错
+    if result.returncode not in (0, 1):
+        return None
+    if not result.stdout:
+        return ""
+    # git 的 diff --git / index / --- / +++ 头部包含服务器上的绝对路径，替换为与 difflib 分支相同的标签
+    hunks_at = result.stdout.find("\n@@")
+    if hunks_at == -1:
+        return None
+    return f"--- {fromfile}\n+++ {tofile}" + result.stdout[hunks_at:]
+
 @mcp.tool()
 def view_doc_changes(path: str) -> str:
     """查看文档的最近变更 (Diff)。"""
@@ -430,13 +672,29 @@ def view_doc_changes(path: str) -> str:
         abs_path = _validate_path(resolved_path)
         
         history_dir = _ensure_history_dir(resolved_path)
-        snaps = sorted([f for f in os.listdir(history_dir) if f.endswith('.snap')])
+        try:
+            names = os.listdir(history_dir)
+        except FileNotFoundError:
+            # 历史目录已被外部删除：重建 (其中自然没有快照)
+            history_dir = _ensure_history_dir(resolved_path, recheck=True)
+            names = os.listdir(history_dir)
+        snaps = sorted([f for f in names if f.endswith('.snap')])
         
         if not snaps:
             return "未找到历史快照 (初始版本)。"
             
         latest_snap = os.path.join(history_dir, snaps[-1])
         
+        fromfile = f"快照 ({snaps[-1]})"
+        tofile = "当前版本"
+        
+        # 大文件优先交给 git diff，失败时回退到 difflib
+        if (os.path.getsize(latest_snap) > _GIT_DIFF_THRESHOLD
+                or os.path.getsize(abs_path) > _GIT_DIFF_THRESHOLD):
+            git_diff = _git_diff_files(latest_snap, abs_path, fromfile, tofile)
+            if git_diff is not None:
+                return git_diff
+        
         with open(latest_snap, 'r', encoding='utf-8') as f:
             old_lines = f.readlines()
         with open(abs_path, 'r', encoding='utf-8') as f:
@@ -444,8 +702,8 @@ def view_doc_changes(path: str) -> str:
             
         diff = difflib.unified_diff(
             old_lines, new_lines,
-            fromfile=f"快照 ({snaps[-1]})",
-            tofile="当前版本",
+            fromfile=fromfile,
+            tofile=tofile,
             lineterm=""
         )
         
@@ -18,13 +18,10 @@ def generate_header_string(config_dict):
     # 第一步：转成 JSON 字符串
     json_str = json.dumps(config_dict, ensure_ascii=False)
     
-    # 第二步：再次转 JSON (这次是为了转义引号)
-    # 也可以手动 replace('"', '\\"')，但 json.dumps 最稳
-    escaped_json_str = json.dumps(json_str) 
-    
-    # 去掉最外层的引号（因为 json.dumps 会加上）
-    # 我们只需要里面的内容： \"key\": \"value\"...
-    inner_content = escaped_json_str[1:-1]
+    # 第二步：转义反斜杠和引号，使其可作为 JSON 字符串的值嵌入
+    # json_str 由 json.dumps 生成，不含原始控制字符，只需处理这两种字符
+    # 得到的内容形如： \"key\": \"value\"...
+    inner_content = json_str.replace('\\', '\\\\').replace('"', '\\"')
     
     print("\n请复制以下内容到 mcp_config.json 的 headers 中：\n")
     print(f'"X-Sub-Agent-Config": "{inner_content}"')